@@ -0,0 +1,236 @@
+import re
+
+from backend.logger import log
+
+
+class CfgParseError(ValueError):
+    """Raised when a file doesn't follow the struct.begin/struct.end layout."""
+
+
+class CfgNode:
+    """A property or a struct of a cfg file, along with the comments and blank lines preceding it."""
+
+    __slots__ = ("key", "prefix", "line", "children", "suffix", "end_line")
+
+    def __init__(self, key, line, prefix=None, children=None, end_line=None):
+        self.key = key
+        self.prefix = prefix or []
+        self.line = line
+        # Ordered mapping of (name, occurrence) to child nodes, None for properties
+        self.children = children
+        self.suffix = []
+        self.end_line = end_line
+
+    @property
+    def is_struct(self):
+        return self.children is not None
+
+    def render(self):
+        lines = list(self.prefix)
+        if self.line is not None:
+            lines.append(self.line)
+        if self.is_struct:
+            for child in self.children.values():
+                lines.extend(child.render())
+            lines.extend(self.suffix)
+            if self.end_line is not None:
+                lines.append(self.end_line)
+        return lines
+
+
+class CfgParser:
+    """Parses S.T.A.L.K.E.R. 2 cfg files into a tree of structs keyed by their names."""
+
+    STRUCT_BEGIN = re.compile(r"^\s*(?P<name>[^:=]+?)\s*:\s*struct\.begin\b")
+    STRUCT_END = re.compile(r"^\s*struct\.end\b")
+    PROPERTY = re.compile(r"^\s*(?P<name>[^=]+?)\s*=")
+    COMMENT = re.compile(r"^\s*(//|$)")
+
+    @classmethod
+    def parse(cls, lines):
+        """Return the root node of the parsed lines (with line endings kept)."""
+        root = CfgNode(key=None, line=None, children={})
+        stack = [root]
+        occurrences = [{}]
+        pending = []
+
+        for number, line in enumerate(lines, start=1):
+            if cls.COMMENT.match(line):
+                pending.append(line)
+                continue
+
+            if cls.STRUCT_END.match(line):
+                if len(stack) == 1:
+                    raise CfgParseError(f"Unexpected struct.end at line {number}")
+                node = stack.pop()
+                occurrences.pop()
+                node.suffix = pending
+                node.end_line = line
+                pending = []
+                continue
+
+            match = cls.STRUCT_BEGIN.match(line)
+            is_struct = match is not None
+            match = match or cls.PROPERTY.match(line)
+            if match is None:
+                raise CfgParseError(f"Unrecognized line {number}: {line.strip()}")
+
+            name = match.group("name")
+            occurrence = occurrences[-1].get(name, 0)
+            occurrences[-1][name] = occurrence + 1
+            key = (name, occurrence)
+
+            node = CfgNode(
+                key=key,
+                line=line,
+                prefix=pending,
+                children={} if is_struct else None,
+            )
+            pending = []
+            stack[-1].children[key] = node
+            if is_struct:
+                stack.append(node)
+                occurrences.append({})
+
+        if len(stack) > 1:
+            raise CfgParseError(f"Struct {stack[-1].key[0]} isn't closed")
+
+        root.suffix = pending
+        return root
+
+
+class CfgMerger:
+    """Three-way merge of cfg trees at the property level."""
+
+    # Array items appended by several mods are kept all instead of conflicting
+    APPENDED_ITEM = "[*]"
+
+    def __init__(self):
+        self.conflicts = 0
+
+    @classmethod
+    def merge_many(cls, base_lines, sides_lines):
+        """
+        Fold changes of all sides into the base.
+        Returns (merged_lines, conflicts); raises CfgParseError for unsupported files.
+        """
+        base = CfgParser.parse(base_lines)
+        sides = [CfgParser.parse(lines) for lines in sides_lines]
+        if not sides:
+            return base.render(), 0
+
+        merger = cls()
+        merged = sides[0]
+        for side in sides[1:]:
+            merged = merger._merge_nodes(base, merged, side)
+
+        log.debug(f"Cfg merge finished with {merger.conflicts} conflicts")
+        return merged.render(), merger.conflicts
+
+    @staticmethod
+    def _normalize(value):
+        if isinstance(value, str):
+            return value.rstrip("\r\n")
+        if isinstance(value, list):
+            return [line.rstrip("\r\n") for line in value]
+        return value
+
+    def _same(self, x, y):
+        if isinstance(x, CfgNode) and isinstance(y, CfgNode):
+            x, y = x.render(), y.render()
+        return self._normalize(x) == self._normalize(y)
+
+    def _merge_value(self, base, a, b, count_conflicts=True):
+        """Plain three-way merge of two values, keeps `a` when they conflict."""
+        if self._same(a, b) or self._same(b, base):
+            return a
+        if self._same(a, base):
+            return b
+        if count_conflicts:
+            self.conflicts += 1
+        return a
+
+    def _merge_nodes(self, base, a, b):
+        if a.is_struct and b.is_struct and (base is None or base.is_struct):
+            return self._merge_structs(base, a, b)
+        return self._merge_value(base, a, b)
+
+    def _merge_structs(self, base, a, b):
+        base = base or CfgNode(key=None, line=None, children={})
+
+        merged = CfgNode(
+            key=a.key,
+            line=self._merge_value(base.line, a.line, b.line),
+            # Comments and blank lines are never worth a conflict
+            prefix=self._merge_value(base.prefix, a.prefix, b.prefix, False),
+            children={},
+            end_line=a.end_line,
+        )
+        merged.suffix = self._merge_value(base.suffix, a.suffix, b.suffix, False)
+        merged.children.update(self._merge_order(base.children, a.children, b.children))
+        return merged
+
+    def _merge_order(self, base_children, a_children, b_children):
+        """Yield merged children in the order of `a`, inserting new `b` children after their surviving predecessor."""
+        b_added = {}
+        previous = None
+        for key, node in b_children.items():
+            if key not in base_children and (
+                key not in a_children or key[0] == self.APPENDED_ITEM
+            ):
+                # Items appended by both sides go after their counterpart in `a`
+                anchor = key if key in a_children else previous
+                b_added.setdefault(anchor, []).append((key, node))
+            # Keys deleted by `a` can't anchor anything, additions after them
+            # go after the nearest key that's still there
+            if key in a_children:
+                previous = key
+
+        a_appended = [
+            node
+            for key, node in a_children.items()
+            if key not in base_children and key[0] == self.APPENDED_ITEM
+        ]
+        occurrence = max(len(base_children), len(a_children), len(b_children))
+
+        def added_after(previous_key):
+            nonlocal occurrence
+            for key, node in b_added.get(previous_key, []):
+                if key[0] == self.APPENDED_ITEM and any(
+                    self._same(node, other) for other in a_appended
+                ):
+                    continue
+                if key in a_children:
+                    # Appended by both sides, keep both items under a new key
+                    key = (key[0], occurrence)
+                    occurrence += 1
+                yield key, node
+
+        yield from added_after(None)
+        for key, a_node in a_children.items():
+            base_node = base_children.get(key)
+            b_node = b_children.get(key)
+
+            if base_node is None:
+                # Added by `a`, and maybe by `b` as well
+                if b_node is None or key[0] == self.APPENDED_ITEM:
+                    yield key, a_node
+                else:
+                    yield key, self._merge_nodes(None, a_node, b_node)
+            elif b_node is None:
+                # Deleted by `b`
+                if not self._same(a_node, base_node):
+                    self.conflicts += 1
+                    yield key, a_node
+            else:
+                yield key, self._merge_nodes(base_node, a_node, b_node)
+
+            yield from added_after(key)
+
+        for key, base_node in base_children.items():
+            if key in a_children or key not in b_children:
+                continue
+            # Deleted by `a`
+            if not self._same(b_children[key], base_node):
+                self.conflicts += 1
+                yield key, b_children[key]
@@ -1,40 +1,283 @@
 import tempfile
 from collections import deque
+from concurrent.futures import wait
 from datetime import datetime
 from pathlib import Path
+from threading import Lock
 
+from backend.event_bus import TaskProgress
 from backend.logger import log
 from backend.merging import Merging
-from backend.parallel_orchestrator import TaskRetryManager, ThreadExecutor
+from backend.parallel_orchestrator import ExecutorRegistry, TaskRetryManager
 from backend.repak import Repak
 from backend.utilities import Files
+from backend.vanilla_index import VanillaIndex
 from config.settings_manager import GamesManager, settings
 from config.translations import translate
 from gui.window_messagebox import ModalFileDialog, WindowMessageBox
 
 
+class UnpackCache:
+    """Session-scoped cache of extracted source pak entries, keyed by path, size and mtime."""
+
+    def __init__(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = Path(self.temp_dir.name)
+        self.lock = Lock()
+        self._key_locks = {}
+        self._destinations = {}
+        self._requested = {}
+        self._extracted = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.temp_dir.cleanup()
+
+    @staticmethod
+    def _make_key(file_path):
+        path = Path(file_path).absolute()
+        stat = path.stat()
+        return str(path), stat.st_size, stat.st_mtime_ns
+
+    def _register(self, key):
+        # Must be called with self.lock held
+        if key not in self._key_locks:
+            self._key_locks[key] = Lock()
+            # Separate folder for every pak, so paks with equal names don't collide
+            self._destinations[key] = self.cache_dir / str(len(self._key_locks))
+            self._requested[key] = set()
+            self._extracted[key] = set()
+
+    def request(self, file_path, entry_path):
+        """Register an entry to be extracted together with others from the same pak."""
+        key = self._make_key(file_path)
+        with self.lock:
+            self._register(key)
+            self._requested[key].add(Path(entry_path).as_posix())
+
+    def get(self, file_path, entry_path, extract_func):
+        """
+        Return the folder holding extracted entries of a pak, calling
+        `extract_func(file_path, entries, destination)` only for entries not extracted yet.
+        All entries requested so far for this pak are extracted in one go.
+        Failed results aren't cached, so callers are free to retry.
+        """
+        key = self._make_key(file_path)
+
+        with self.lock:
+            self._register(key)
+            self._requested[key].add(Path(entry_path).as_posix())
+            key_lock = self._key_locks[key]
+            destination = self._destinations[key]
+
+        with key_lock:
+            with self.lock:
+                pending = sorted(self._requested[key] - self._extracted[key])
+
+            if not pending:
+                log.debug(f"Using cached entries of {file_path}")
+                return True, str(destination)
+
+            success, result = extract_func(file_path, pending, destination)
+            if success:
+                with self.lock:
+                    self._extracted[key].update(pending)
+            return success, result
+
+
+class ConflictAnalyzer:
+    """Compares entries shipped by several paks."""
+
+    @classmethod
+    def find_identical_entries(cls, gathered_entries):
+        """
+        Return paths of entries that are shipped by several paks with byte-identical content.
+        `gathered_entries` maps pak paths to entries listed by `Repak.get_entries`.
+        Index hashes are compared first, content is hashed only when they can't tell.
+        """
+        sources_by_path = {}
+        for source, entries in gathered_entries.items():
+            for path in entries:
+                sources_by_path.setdefault(path, []).append(source)
+
+        identical = set()
+        undecided = {}
+        for path, sources in sources_by_path.items():
+            if len(sources) < 2:
+                continue
+            metas = [gathered_entries[source][path] for source in sources]
+
+            sizes = {meta.get("size") for meta in metas}
+            if len(sizes) > 1 and None not in sizes:
+                continue
+
+            # Index hashes are taken from stored data, so they're comparable only with equal compression
+            if all(meta.get("hash") for meta in metas) and (
+                len({meta.get("compression") for meta in metas}) == 1
+            ):
+                if len({meta.get("hash") for meta in metas}) == 1:
+                    identical.add(path)
+                continue
+
+            undecided[path] = sources
+
+        if undecided:
+            identical.update(cls._compare_content_hashes(undecided))
+
+        log.debug(f"Found {len(identical)} entries identical in all sources.")
+        return identical
+
+    @classmethod
+    def _compare_content_hashes(cls, sources_by_path):
+        hashes_by_source = cls._hash_entries(sources_by_path)
+
+        identical = set()
+        for path, sources in sources_by_path.items():
+            hashes = [hashes_by_source.get(source, {}).get(path) for source in sources]
+            if all(hashes) and len(set(hashes)) == 1:
+                identical.add(path)
+        return identical
+
+    @staticmethod
+    def _hash_entries(sources_by_path):
+        """Return SHA1 hashes of uncompressed entries by pak, entries that failed are left out."""
+        paths_by_source = {}
+        for path, sources in sources_by_path.items():
+            for source in sources:
+                paths_by_source.setdefault(source, []).append(path)
+
+        task_retry_manager = TaskRetryManager(ExecutorRegistry().get("cpu"))
+        hashes_by_source, results_ko = task_retry_manager.execute_tasks_with_retries(
+            list(paths_by_source),
+            lambda source: Repak.hash_entries(source, paths_by_source[source]),
+            task_name="hash",
+        )
+        for source, error in results_ko.items():
+            log.warning(f"Couldn't hash entries of {source}: {error}")
+        return hashes_by_source
+
+    @classmethod
+    def find_vanilla_copies(cls, gathered_entries):
+        """
+        Return paks shipping unmodified copies of vanilla files, by the conflicting entry path.
+        Such entries change nothing by themselves, but still override other mods by load order.
+        """
+        sources_by_path = {}
+        for source, entries in gathered_entries.items():
+            for path in entries:
+                sources_by_path.setdefault(path, []).append(source)
+        sources_by_path = {
+            path: sources
+            for path, sources in sources_by_path.items()
+            if len(sources) > 1
+        }
+
+        vanilla_index = VanillaIndex()
+        vanilla_index.refresh(item["unpacked"] for item in GamesManager().vanilla_files)
+        vanilla_hashes = vanilla_index.get_hashes(sources_by_path)
+
+        copies = {}
+        undecided = {}
+        for path, (vanilla_size, vanilla_hash) in vanilla_hashes.items():
+            for source in sources_by_path[path]:
+                meta = gathered_entries[source][path]
+                if meta.get("size") not in (None, vanilla_size):
+                    continue
+                # Index hashes of stored uncompressed data are content hashes as well
+                if meta.get("hash") and meta.get("compression") is None:
+                    if meta["hash"] == vanilla_hash:
+                        copies.setdefault(path, set()).add(source)
+                    continue
+                undecided.setdefault(path, []).append(source)
+
+        if undecided:
+            hashes_by_source = cls._hash_entries(undecided)
+            for path, sources in undecided.items():
+                for source in sources:
+                    if (
+                        hashes_by_source.get(source, {}).get(path)
+                        == vanilla_hashes[path][1]
+                    ):
+                        copies.setdefault(path, set()).add(source)
+
+        log.debug(
+            f"Found {sum(map(len, copies.values()))} conflicting entries identical to vanilla."
+        )
+        return copies
+
+    @staticmethod
+    def split_vanilla_copies(vanilla_copies, path, sources):
+        """Split sources of an entry into (modified, vanilla copies) lists, keeping their order."""
+        copies = {str(Path(source)) for source in vanilla_copies.get(path, ())}
+        modified = [source for source in sources if str(Path(source)) not in copies]
+        return modified, [source for source in sources if str(Path(source)) in copies]
+
+    @staticmethod
+    def without_entries(gathered_entries, removed_entries):
+        """
+        Return a copy of gathered entries without the removed ones, given as paks by entry path.
+        Gathered entries themselves are left intact, they may be shared with the pak index cache.
+        """
+        removed_by_source = {}
+        for path, sources in removed_entries.items():
+            for source in sources:
+                removed_by_source.setdefault(source, set()).add(path)
+        return {
+            source: (
+                {
+                    path: meta
+                    for path, meta in entries.items()
+                    if path not in removed_by_source[source]
+                }
+                if source in removed_by_source
+                else entries
+            )
+            for source, entries in gathered_entries.items()
+        }
+
+
 class ConflictProcessor:
     """Handles file processing, unpacking, and merging logic."""
 
-    def __init__(self, master, ignore_no_conflicts):
+    # Number of upcoming items prepared while the current one is being merged
+    PREFETCH_DEPTH = 3
+
+    def __init__(self, master, ignore_no_conflicts, vanilla_copies=None):
         self.master = master
         self.tree = master.tree
         self.ignore_no_conflicts = ignore_no_conflicts
+        # Paks shipping unmodified vanilla files, by entry path
+        self.vanilla_copies = vanilla_copies or {}
         self.processed_conflicts = deque()
         self.not_processed = deque()
 
         self.games_manager = GamesManager()
 
-        self.executor = ThreadExecutor()
+        self.executor = ExecutorRegistry().get("subprocess")
         self.retry_manager = TaskRetryManager(self.executor)
-
-    def process_selected_files(self):
+        self.unpack_cache = None
+        self.temp_merging_dir = None
+        self.items = []
+        self.cancel_token = None
+
+        self.prefetch_executor = ExecutorRegistry().get("prefetch")
+        self.prefetched = {}
+        # Prefetch results of the item being processed
+        self.prepared = {}
+        self.vanilla_index = VanillaIndex()
+
+    def collect_selected_items(self):
+        """
+        Check the merging engine and read items selected in the tree.
+        Must be called on the main thread, returns a report when there's nothing to process.
+        """
         merging_engine = settings.MERGING_ENGINE
         tool_paths = settings.TOOLS_PATHS
-        if merging_engine == "WinMerge":
-            engine_path = Path(tool_paths.get("winmerge"))
-        elif merging_engine == "KDiff3":
-            engine_path = Path(tool_paths.get("kdiff3"))
+        # Automatic engines still need their fallback tool for real conflicts
+        engine_tool = Merging.get_engine_tool(merging_engine)
+        engine_path = Path(tool_paths.get(engine_tool) or "")
         if not Files.is_existing_file_type(engine_path, ".exe"):
             log.error(f"{merging_engine} executable isn't found at {str(engine_path)}")
             return "error", (
@@ -49,186 +292,376 @@ class ConflictProcessor:
         if not selected_items:
             return "warning", (translate("merge_screen_conflicts_select_files"))
 
+        self.items = [(item_id, self.tree.item(item_id)) for item_id in selected_items]
+        return None
+
+    def merge_items(self, progress_callback=None, cancel_token=None):
+        """
+        Unpack and merge collected items into a temporary folder, safe to run in a background thread.
+        Progress is reported as (done, total, item_name), cancellation is checked between items.
+        Returns a report when there's nothing to repack.
+        """
         self.processed_conflicts = deque()
         self.not_processed = deque()
+        self.cancel_token = cancel_token
 
-        with tempfile.TemporaryDirectory() as temp_merging_dir:
-            temp_merging_dir = Path(temp_merging_dir)
-            for item_id in selected_items:
-                try:
-                    item = self.tree.item(item_id)
-                    item_tags = item["tags"]
-                    item_name = item["text"]
+        self.vanilla_index.refresh(
+            item["unpacked"] for item in self.games_manager.vanilla_files
+        )
+        self.unpack_cache = UnpackCache()
+        self.temp_merging_dir = tempfile.TemporaryDirectory()
+        temp_merging_dir = Path(self.temp_merging_dir.name)
+
+        with self.unpack_cache, TaskProgress("merge", total=len(self.items)) as task:
+            self._request_entries(self.items)
+            self.prefetched = {}
+            try:
+                total = len(self.items)
+                for index, (item_id, item) in enumerate(self.items):
+                    if cancel_token is not None and cancel_token.is_cancelled:
+                        log.info(f"Merging cancelled after {index} of {total} items.")
+                        task.fail("Cancelled")
+                        self.cleanup()
+                        return "warning", (
+                            translate("merge_screen_conflicts_cancelled")
+                        )
 
-                    item_values = item.get("values", [])
+                    self._prefetch_items(
+                        self.items[index + 1 : index + 1 + self.PREFETCH_DEPTH]
+                    )
 
-                    if len(item_values) < 3:
-                        log.warning(
-                            f"Item '{item_name}' ({item_id}) has insufficient values: {item_values}"
-                        )
-                        self.not_processed.append(
-                            f"{item_name} ({translate('merging_error_invalid_values')})"
-                        )
-                        continue
+                    if progress_callback:
+                        progress_callback(index, total, item.get("text"))
+                    self.prepared = self._take_prefetched(item_id)
+                    self._process_item(item_id, item, temp_merging_dir)
+                    task.advance(count=1, message=item.get("text"))
+
+                if progress_callback:
+                    progress_callback(total, total, None)
+            finally:
+                self.prepared = {}
+                self._stop_prefetching()
+
+        if not self.processed_conflicts and self.not_processed:
+            self.cleanup()
+            not_processed_str = "\n".join(map(str, self.not_processed))
+            not_processed_str2 = ", ".join(map(str, self.not_processed))
+            log.warning("No files were processed!")
+            log.debug(f"Skipped files: {not_processed_str2}")
+            return "info", (
+                [
+                    f'{translate("merge_screen_conflicts_no_files_processed")}\n\n{translate("merge_screen_conflicts_final_report_3")}',
+                    not_processed_str,
+                ]
+            )
 
-                    if not item_values[0] or not item_values[1] or not item_values[2]:
-                        log.debug(
-                            f"Item '{item_name}' ({item_id}) is probably not a file, skipping."
-                        )
-                        continue
-
-                    item_sources_names = item_values[0].split(", ")
-                    item_sources_paths = item_values[1].split(", ")
-                    item_path = Path(item_values[2])
-
-                    log.debug(f"Starting to process {item_name}...")
-                    log.debug(f"{item_name} tags: {item_tags}...")
-                    log.debug(f"{item_name} internal path: {item_path}...")
-                    log.debug(f"{item_name} sources paths: {item_sources_paths}...")
-
-                    if "no_conflicts" in item_tags:
-                        if self.ignore_no_conflicts:
-                            log.debug(f"{item_name} skipped (no conflicts)")
-                            self.not_processed.append(
-                                f"{item_name} ({translate('merging_error_no_conflicts')})"
-                            )
-                        else:
-                            self._unpack_and_merge(
-                                item_name,
-                                item_sources_paths,
-                                item_sources_names,
-                                item_path,
-                                temp_merging_dir,
-                                True,
-                            )
-                    elif "dual_match" in item_tags:
-                        self._unpack_and_merge(
-                            item_name,
-                            item_sources_paths,
-                            item_sources_names,
-                            item_path,
-                            temp_merging_dir,
-                            True,
-                        )
-                    elif "dual_no_match" in item_tags:
-                        self._unpack_and_merge(
-                            item_name,
-                            item_sources_paths,
-                            item_sources_names,
-                            item_path,
-                            temp_merging_dir,
-                        )
-                    elif "tri" in item_tags:
-                        self._unpack_and_merge(
-                            item_name,
-                            item_sources_paths,
-                            item_sources_names,
-                            item_path,
-                            temp_merging_dir,
-                        )
-                    elif "complex" in item_tags:
-                        log.debug(f"{item_name} skipped (too much sources)")
-                        self.not_processed.append(
-                            f"{item_name} ({translate('merging_error_too_much_sources')})"
-                        )
-                    else:
-                        log.debug(f"{item_name} skipped (ineligible for merging)")
-                        self.not_processed.append(
-                            f"{item_name} ({translate('merging_error_ineligible_for_merging')})"
-                        )
+        elif Files.is_folder_empty(temp_merging_dir):
+            self.cleanup()
+            return "error", (translate("merge_dir_is_empty"))
 
-                except KeyError as e:
-                    log.exception(f"Missing key for item '{item_name}': {e}")
-                    self.not_processed.append(
-                        f"{item_name} ({translate('merging_error_missing_key')} key)"
+        return None
+
+    def ask_merged_mod_location(self):
+        """Must be called on the main thread."""
+        return self._insistent_askdirectory(
+            parent=self.master,
+            initialdir=self.games_manager.mods_path,
+            title=translate("merge_screen_conflicts_merged_mod_save_location"),
+        )
+
+    def repack_merged_mod(self, folder_to_place_merged_mod, cancel_token=None):
+        """Pack merged items into a mod, safe to run in a background thread."""
+        temp_merging_dir = Path(self.temp_merging_dir.name)
+
+        formatted_time = datetime.now().strftime("%Y%m%d%H%M%S")
+        merged_mod_name = (
+            settings.MERGED_STATIC_NAME
+            or f"{settings.MERGED_PREFIX}zonepaq_merged_{formatted_time}_P.pak"
+        )
+        merged_mod_path = folder_to_place_merged_mod / merged_mod_name
+
+        log.info(
+            f"Repacking: {str(temp_merging_dir)} into {str(folder_to_place_merged_mod)}"
+        )
+
+        try:
+            repack_success, repak_result = Repak.repack(
+                temp_merging_dir,
+                forced_destination=merged_mod_path,
+                cancel_token=cancel_token,
+            )
+
+            if repack_success:
+                processed_str = "\n".join(map(str, self.processed_conflicts))
+                not_processed_str = "\n".join(map(str, self.not_processed))
+                message = [
+                    f'{translate("merge_screen_conflicts_final_report_1")}',
+                    repak_result,
+                ]
+                if processed_str:
+                    message.extend(
+                        [
+                            translate("merge_screen_conflicts_final_report_2"),
+                            processed_str,
+                        ]
                     )
-                except Exception as e:
-                    log.exception(f"Error processing '{item_name}': {e}")
-                    self.not_processed.append(
-                        f"{item_name} ({translate('merging_error_processing_error')})"
+                if not_processed_str:
+                    message.extend(
+                        [
+                            translate("merge_screen_conflicts_final_report_3"),
+                            not_processed_str,
+                        ]
                     )
+                return "info", (message)
 
-            if not self.processed_conflicts and self.not_processed:
-                not_processed_str = "\n".join(map(str, self.not_processed))
-                not_processed_str2 = ", ".join(map(str, self.not_processed))
-                log.warning("No files were processed!")
-                log.debug(f"Skipped files: {not_processed_str2}")
-                return "info", (
+            elif cancel_token is not None and cancel_token.is_cancelled:
+                return "warning", (translate("merge_screen_conflicts_cancelled"))
+
+            else:
+                return "error", (
                     [
-                        f'{translate("merge_screen_conflicts_no_files_processed")}\n\n{translate("merge_screen_conflicts_final_report_3")}',
-                        not_processed_str,
+                        translate("merge_screen_conflicts_repak_error"),
+                        str(repak_result),
                     ]
                 )
 
-            elif Files.is_folder_empty(temp_merging_dir):
-                return "error", (translate("merge_dir_is_empty"))
-            else:
-                folder_to_place_merged_mod = self._insistent_askdirectory(
-                    parent=self.master,
-                    initialdir=self.games_manager.mods_path,
-                    title=translate("merge_screen_conflicts_merged_mod_save_location"),
+        except Exception as e:
+            log.exception(f"Unexpected error during repack: {str(e)}")
+            return "error", (
+                [
+                    translate("merge_screen_conflicts_repak_error"),
+                    str(e),
+                ]
+            )
+        finally:
+            self.cleanup()
+
+    def cleanup(self):
+        if self.temp_merging_dir is not None:
+            self.temp_merging_dir.cleanup()
+            self.temp_merging_dir = None
+
+    def _process_item(self, item_id, item, temp_merging_dir):
+        try:
+            item_tags = item["tags"]
+            item_name = item["text"]
+
+            item_values = item.get("values", [])
+
+            if len(item_values) < 3:
+                log.warning(
+                    f"Item '{item_name}' ({item_id}) has insufficient values: {item_values}"
                 )
-                if folder_to_place_merged_mod:
+                self.not_processed.append(
+                    f"{item_name} ({translate('merging_error_invalid_values')})"
+                )
+                return
 
-                    formatted_time = datetime.now().strftime("%Y%m%d%H%M%S")
-                    merged_mod_name = (
-                        settings.MERGED_STATIC_NAME
-                        or f"{settings.MERGED_PREFIX}zonepaq_merged_{formatted_time}_P.pak"
-                    )
-                    merged_mod_path = folder_to_place_merged_mod / merged_mod_name
+            if not item_values[0] or not item_values[1] or not item_values[2]:
+                log.debug(
+                    f"Item '{item_name}' ({item_id}) is probably not a file, skipping."
+                )
+                return
 
-                    log.info(
-                        f"Repacking: {str(temp_merging_dir)} into {str(folder_to_place_merged_mod)}"
+            item_path = Path(item_values[2])
+            item_sources_paths, item_sources_names, shadowed = self._select_sources(
+                item_path, item_values[1].split(", "), item_values[0].split(", ")
+            )
+
+            log.debug(f"Starting to process {item_name}...")
+            log.debug(f"{item_name} tags: {item_tags}...")
+            log.debug(f"{item_name} internal path: {item_path}...")
+            log.debug(f"{item_name} sources paths: {item_sources_paths}...")
+
+            if "no_conflicts" in item_tags:
+                if self.ignore_no_conflicts:
+                    log.debug(f"{item_name} skipped (no conflicts)")
+                    self.not_processed.append(
+                        f"{item_name} ({translate('merging_error_no_conflicts')})"
                     )
+                else:
+                    self._unpack_and_merge(
+                        item_name,
+                        item_sources_paths,
+                        item_sources_names,
+                        item_path,
+                        temp_merging_dir,
+                        True,
+                    )
+            elif "identical" in item_tags:
+                # Vanilla copies would win over the skipped file by load order
+                if self.ignore_no_conflicts and not shadowed:
+                    log.debug(f"{item_name} skipped (identical in all sources)")
+                    self.not_processed.append(
+                        f"{item_name} ({translate('merging_error_identical')})"
+                    )
+                else:
+                    self._copy_first_source(
+                        item_name,
+                        item_sources_paths,
+                        item_sources_names,
+                        item_path,
+                        temp_merging_dir,
+                        "is identical in all sources",
+                    )
+            elif "vanilla_copy" in item_tags:
+                self._copy_first_source(
+                    item_name,
+                    item_sources_paths,
+                    item_sources_names,
+                    item_path,
+                    temp_merging_dir,
+                    "is modified by a single source",
+                )
+            elif "dual_match" in item_tags:
+                self._unpack_and_merge(
+                    item_name,
+                    item_sources_paths,
+                    item_sources_names,
+                    item_path,
+                    temp_merging_dir,
+                    True,
+                )
+            elif "dual_no_match" in item_tags:
+                self._unpack_and_merge(
+                    item_name,
+                    item_sources_paths,
+                    item_sources_names,
+                    item_path,
+                    temp_merging_dir,
+                )
+            elif "tri" in item_tags:
+                self._unpack_and_merge(
+                    item_name,
+                    item_sources_paths,
+                    item_sources_names,
+                    item_path,
+                    temp_merging_dir,
+                )
+            elif "complex" in item_tags:
+                log.debug(f"{item_name} skipped (too much sources)")
+                self.not_processed.append(
+                    f"{item_name} ({translate('merging_error_too_much_sources')})"
+                )
+            else:
+                log.debug(f"{item_name} skipped (ineligible for merging)")
+                self.not_processed.append(
+                    f"{item_name} ({translate('merging_error_ineligible_for_merging')})"
+                )
 
-                    try:
-                        repack_success, repak_result = Repak.repack(
-                            temp_merging_dir, forced_destination=merged_mod_path
-                        )
+        except KeyError as e:
+            log.exception(f"Missing key for item '{item_name}': {e}")
+            self.not_processed.append(
+                f"{item_name} ({translate('merging_error_missing_key')} key)"
+            )
+        except Exception as e:
+            log.exception(f"Error processing '{item_name}': {e}")
+            self.not_processed.append(
+                f"{item_name} ({translate('merging_error_processing_error')})"
+            )
 
-                        if repack_success:
-                            processed_str = "\n".join(
-                                map(str, self.processed_conflicts)
-                            )
-                            not_processed_str = "\n".join(map(str, self.not_processed))
-                            message = [
-                                f'{translate("merge_screen_conflicts_final_report_1")}',
-                                repak_result,
-                            ]
-                            if processed_str:
-                                message.extend(
-                                    [
-                                        translate(
-                                            "merge_screen_conflicts_final_report_2"
-                                        ),
-                                        processed_str,
-                                    ]
-                                )
-                            if not_processed_str:
-                                message.extend(
-                                    [
-                                        translate(
-                                            "merge_screen_conflicts_final_report_3"
-                                        ),
-                                        not_processed_str,
-                                    ]
-                                )
-                            return "info", (message)
-
-                        else:
-                            return "error", (message)
-
-                    except Exception as e:
-                        log.exception(f"Unexpected error during repack: {str(e)}")
-                        return "error", (
-                            [
-                                translate("merge_screen_conflicts_repak_error"),
-                                str(e),
-                            ]
-                        )
+    def _request_entries(self, items):
+        """Let the unpack cache know all entries needed from every source pak."""
+        for item_id, item in items:
+            try:
+                source_paths, item_path = self._get_required_sources(item)
+                for source_path in source_paths:
+                    self.unpack_cache.request(source_path, item_path)
+            except Exception as e:
+                log.warning(f"Couldn't request entries for item {item_id}: {e}")
+
+    def _get_required_sources(self, item):
+        """Return source paks that have to be unpacked for the item and its internal path."""
+        item_tags = item["tags"]
+        item_values = item.get("values", [])
+
+        if len(item_values) < 3 or not all(item_values[:3]):
+            return [], None
+        if "complex" in item_tags:
+            return [], None
+
+        source_paths, _, shadowed = self._select_sources(
+            Path(item_values[2]), item_values[1].split(", ")
+        )
+        if self.ignore_no_conflicts and (
+            "no_conflicts" in item_tags or ("identical" in item_tags and not shadowed)
+        ):
+            return [], None
+
+        if "identical" in item_tags or "vanilla_copy" in item_tags:
+            # Any copy will do
+            source_paths = source_paths[:1]
+
+        return source_paths, item_values[2]
+
+    def _select_sources(self, item_path, item_sources_paths, item_sources_names=None):
+        """
+        Leave vanilla copies out of the item sources, unless nothing else is left.
+        Returns (paths, names, shadowed), shadowed when some vanilla copies were left out.
+        """
+        modified, copies = ConflictAnalyzer.split_vanilla_copies(
+            self.vanilla_copies, item_path.as_posix(), item_sources_paths
+        )
+        if not modified or not copies:
+            return item_sources_paths, item_sources_names, False
+
+        log.debug(f"{item_path.as_posix()} vanilla copies left out: {copies}")
+        if item_sources_names is not None:
+            item_sources_names = [
+                name
+                for path, name in zip(item_sources_paths, item_sources_names)
+                if path in modified
+            ]
+        return modified, item_sources_names, True
+
+    def _prefetch_items(self, items):
+        for item_id, item in items:
+            if item_id not in self.prefetched:
+                self.prefetched[item_id] = self.prefetch_executor.run(
+                    self._prefetch_item, item_id, item
+                )
 
-                else:
-                    return "warning", (translate("merge_screen_conflicts_aborted"))
+    def _prefetch_item(self, item_id, item):
+        """
+        Unpack sources and look up the vanilla base of an upcoming item.
+        Returns the unpacked folders by source and the vanilla files, picked up by `merge_items`.
+        """
+        prepared = {"unpacked": {}}
+        try:
+            source_paths, item_path = self._get_required_sources(item)
+            for source_path in source_paths:
+                success, result = self.unpack_cache.get(
+                    source_path, item_path, self.unpack_file
+                )
+                if success:
+                    prepared["unpacked"][source_path] = result
+            if item_path:
+                prepared["vanilla_files"] = self._find_vanilla_files(Path(item_path))
+        except Exception as e:
+            # Not critical, the rest will be unpacked when the item's turn comes
+            log.debug(f"Prefetching of item {item_id} failed: {e}")
+        return prepared
+
+    def _take_prefetched(self, item_id):
+        """Wait for the prefetch of the item, if there's one, and return its results."""
+        future = self.prefetched.pop(item_id, None)
+        if future is None or future.cancelled():
+            return {}
+        try:
+            return future.result()
+        except Exception as e:
+            log.debug(f"Prefetching of item {item_id} failed: {e}")
+            return {}
+
+    def _stop_prefetching(self):
+        for future in self.prefetched.values():
+            future.cancel()
+        # Running prefetches still write into the unpack cache
+        wait(self.prefetched.values())
+        self.prefetched = {}
+
+    def _find_vanilla_files(self, item_path):
+        return self.vanilla_index.find(item_path)
 
     def _unpack_and_merge(
         self,
@@ -239,24 +672,52 @@ class ConflictProcessor:
         temp_merging_dir,
         use_vanilla=False,
     ):
+        unpacked_files = self.unpack_files(
+            item_sources_paths, item_sources_names, item_path
+        )
+        self._merge_files(
+            unpacked_files,
+            item_name,
+            item_path,
+            temp_merging_dir,
+            use_vanilla,
+            expected_sides=len(item_sources_paths),
+        )
 
-        with tempfile.TemporaryDirectory() as temp_unpack_dir:
-            temp_dir_path = Path(temp_unpack_dir)
-            unpacked_files = self.unpack_files(
-                item_sources_paths, item_sources_names, item_path, temp_dir_path
+    def _copy_first_source(
+        self,
+        item_name,
+        item_sources_paths,
+        item_sources_names,
+        item_path,
+        temp_merging_dir,
+        reason,
+    ):
+        # There's nothing to merge, so the first source is used as is
+        unpacked_files = self.unpack_files(
+            item_sources_paths[:1], item_sources_names[:1], item_path
+        )
+        if not unpacked_files:
+            log.error(f"No valid files to copy for {str(item_path)}")
+            self.not_processed.append(
+                f"{item_name} ({translate('merging_error_processing_error')})"
             )
-            self._merge_files(
-                unpacked_files,
-                item_name,
-                item_path,
-                temp_merging_dir,
-                use_vanilla,
+            return
+
+        if Files.copy_path(unpacked_files[0], temp_merging_dir / item_path):
+            log.info(f"{str(item_path)} {reason}, copied as is")
+            self.processed_conflicts.append(item_name)
+        else:
+            self.not_processed.append(
+                f"{item_name} ({translate('merging_error_processing_error')})"
             )
 
-    def unpack_file(self, file_path, temp_dir_path):
+    def unpack_file(self, file_path, entries, temp_dir_path):
 
         try:
-            success, unpacked_folder = Repak.unpack(file_path, temp_dir_path)
+            success, unpacked_folder = Repak.extract_entries(
+                file_path, entries, temp_dir_path, cancel_token=self.cancel_token
+            )
             if success:
                 return True, unpacked_folder
             else:
@@ -266,21 +727,30 @@ class ConflictProcessor:
             log.exception(f"Error unpacking file {file_path}: {e}")
             return False, str(e)
 
-    def unpack_files(
-        self, item_sources_paths, item_sources_names, item_path, temp_dir_path
-    ):
+    def unpack_files(self, item_sources_paths, item_sources_names, item_path):
 
         unpacked_files = deque()
 
         def unpack_task(file_path):
-            return self.unpack_file(file_path, temp_dir_path)
-
-        results_ok, results_ko = self.retry_manager.execute_tasks_with_retries(
-            files=item_sources_paths, func=unpack_task
-        )
+            return self.unpack_cache.get(file_path, item_path, self.unpack_file)
+
+        # Sources unpacked by the prefetch are taken as they are
+        prefetched = self.prepared.get("unpacked", {})
+        remaining = [path for path in item_sources_paths if path not in prefetched]
+        results_ok, results_ko = {}, {}
+        if remaining:
+            results_ok, results_ko = self.retry_manager.execute_tasks_with_retries(
+                files=remaining,
+                func=unpack_task,
+                task_name="extract",
+                cancel_token=self.cancel_token,
+            )
+        results_ok.update(prefetched)
 
-        for file_path, result in results_ok.items():
-            unpacked_file = Path(result) / item_path
+        for file_path in item_sources_paths:
+            if file_path not in results_ok:
+                continue
+            unpacked_file = Path(results_ok[file_path]) / item_path
             if unpacked_file.exists() and unpacked_file.is_file():
                 unpacked_files.append(unpacked_file)
             else:
@@ -292,25 +762,46 @@ class ConflictProcessor:
         return unpacked_files
 
     def _merge_files(
-        self, unpacked_files, item_name, item_path, temp_merging_dir, use_vanilla=False
+        self,
+        unpacked_files,
+        item_name,
+        item_path,
+        temp_merging_dir,
+        use_vanilla=False,
+        expected_sides=None,
     ):
         if not unpacked_files:
             log.error(f"No valid files to compare for {str(item_path)}")
             return
 
+        # Merging what's left automatically would silently drop changes of the missing mods
+        complete = expected_sides is None or len(unpacked_files) >= expected_sides
+        if not complete:
+            log.warning(
+                f"Only {len(unpacked_files)} of {expected_sides} sources of {str(item_path)} were unpacked, leaving the merge to the user"
+            )
+
         save_path = temp_merging_dir / item_path
         Files.create_dir(save_path.parent)
 
+        vanilla_files = self.prepared.get("vanilla_files")
+        if vanilla_files is None:
+            vanilla_files = self._find_vanilla_files(item_path)
+        base_file = vanilla_files[0] if vanilla_files else None
         if use_vanilla:
+            for vanilla_file in vanilla_files:
+                unpacked_files.appendleft(vanilla_file)
 
-            for item in self.games_manager.vanilla_files:
-                unpacked_folder = item["unpacked"]
-                vanilla_file = Path(unpacked_folder) / item_path
-
-                if vanilla_file.exists() and vanilla_file.is_file():
-                    unpacked_files.appendleft(vanilla_file)
+        compare_success, compare_result = Merging._run_engine(
+            unpacked_files, save_path, base_file, auto_merge=complete
+        )
 
-        compare_success, compare_result = Merging._run_engine(unpacked_files, save_path)
+        if not compare_success:
+            log.error(f"Merging failed for {str(item_path)}")
+            self.not_processed.append(
+                f"{item_name} ({translate('merging_error_processing_error')})"
+            )
+            return
 
         log.debug(
             f"{settings.MERGING_ENGINE} returned with code {compare_result.returncode}"
@@ -318,7 +809,7 @@ class ConflictProcessor:
 
         file_exists = Files.is_existing_file(save_path)
 
-        if compare_success and compare_result.returncode == 0 and file_exists:
+        if compare_result.returncode == 0 and file_exists:
             log.info(f"Merging successful for {str(item_path)}")
             self.processed_conflicts.append(item_name)
         else:
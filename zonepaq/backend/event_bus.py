@@ -0,0 +1,197 @@
+import itertools
+import threading
+import time
+
+from backend.logger import log
+
+
+class TaskEvent:
+    """State of a background task at the moment it was published."""
+
+    STARTED = "started"
+    PROGRESS = "progress"
+    FINISHED = "finished"
+    FAILED = "failed"
+
+    __slots__ = (
+        "kind",
+        "task_id",
+        "name",
+        "subject",
+        "done",
+        "total",
+        "bytes_done",
+        "bytes_total",
+        "message",
+        "started_at",
+        "timestamp",
+    )
+
+    def __init__(
+        self,
+        kind,
+        task_id,
+        name,
+        subject=None,
+        done=0,
+        total=None,
+        bytes_done=0,
+        bytes_total=None,
+        message=None,
+        started_at=None,
+    ):
+        self.kind = kind
+        self.task_id = task_id
+        # Kind of the operation, e.g. "unpack", and what it's applied to
+        self.name = name
+        self.subject = subject
+        self.done = done
+        self.total = total
+        self.bytes_done = bytes_done
+        self.bytes_total = bytes_total
+        self.message = message
+        self.timestamp = time.monotonic()
+        self.started_at = started_at or self.timestamp
+
+    @property
+    def is_over(self):
+        return self.kind in (self.FINISHED, self.FAILED)
+
+    @property
+    def fraction(self):
+        """Completed part of the task from 0 to 1, by bytes when known, else None."""
+        if self.bytes_total:
+            return min(self.bytes_done / self.bytes_total, 1)
+        if self.total:
+            return min(self.done / self.total, 1)
+        return None
+
+    @property
+    def eta(self):
+        """Estimated seconds left, extrapolated from the average speed so far."""
+        fraction = self.fraction
+        if not fraction or self.is_over:
+            return None
+        elapsed = self.timestamp - self.started_at
+        return elapsed * (1 - fraction) / fraction
+
+    def __repr__(self):
+        return f"TaskEvent({self.kind}, {self.name}, {self.subject}, {self.done}/{self.total}, {self.bytes_done}/{self.bytes_total})"
+
+
+class EventBus:
+    """Thread-safe publisher of task events, subscribers are called in the publishing thread."""
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls, *args, **kwargs):
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = super().__new__(cls)
+                cls._instance.initialize()
+        return cls._instance
+
+    def initialize(self):
+        self.subscribers = {}
+        self.subscribers_lock = threading.Lock()
+        self.tokens = itertools.count()
+        self.task_ids = itertools.count(1)
+
+    def subscribe(self, callback):
+        """Call `callback(event)` for every published event, returns a token to unsubscribe."""
+        with self.subscribers_lock:
+            token = next(self.tokens)
+            self.subscribers[token] = callback
+        return token
+
+    def unsubscribe(self, token):
+        with self.subscribers_lock:
+            self.subscribers.pop(token, None)
+
+    def new_task_id(self):
+        return next(self.task_ids)
+
+    def publish(self, event):
+        with self.subscribers_lock:
+            subscribers = list(self.subscribers.values())
+        for callback in subscribers:
+            try:
+                callback(event)
+            except Exception as e:
+                log.error(f"Event subscriber failed on {event}: {e}")
+
+
+class TaskProgress:
+    """
+    Publishes started/progress/finished/failed events of one task.
+    Used as a context manager, the task fails if the block raises.
+    """
+
+    # Progress events are throttled, subscribers only need the latest state
+    MIN_INTERVAL = 0.1
+
+    def __init__(self, name, subject=None, total=None, bytes_total=None):
+        self.bus = EventBus()
+        self.task_id = self.bus.new_task_id()
+        self.name = name
+        self.subject = subject
+        self.done = 0
+        self.total = total
+        self.bytes_done = 0
+        self.bytes_total = bytes_total
+        self.started_at = None
+        self.last_published = 0
+        self.is_over = False
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.fail(str(exc_value))
+        else:
+            self.finish()
+        return False
+
+    def _publish(self, kind, message=None):
+        event = TaskEvent(
+            kind,
+            self.task_id,
+            self.name,
+            subject=self.subject,
+            done=self.done,
+            total=self.total,
+            bytes_done=self.bytes_done,
+            bytes_total=self.bytes_total,
+            message=message,
+            started_at=self.started_at,
+        )
+        self.last_published = event.timestamp
+        self.bus.publish(event)
+
+    def start(self, message=None):
+        self.started_at = time.monotonic()
+        self._publish(TaskEvent.STARTED, message)
+
+    def advance(self, count=0, size=0, message=None):
+        """Add finished items and processed bytes to the task."""
+        self.done += count
+        self.bytes_done += size
+        if time.monotonic() - self.last_published >= self.MIN_INTERVAL:
+            self._publish(TaskEvent.PROGRESS, message)
+
+    def finish(self, message=None):
+        if self.is_over:
+            return
+        self.is_over = True
+        if self.bytes_total is not None:
+            self.bytes_done = self.bytes_total
+        self._publish(TaskEvent.FINISHED, message)
+
+    def fail(self, message=None):
+        if self.is_over:
+            return
+        self.is_over = True
+        self._publish(TaskEvent.FAILED, message)
@@ -0,0 +1,96 @@
+from difflib import SequenceMatcher
+
+
+class Merge3:
+    """Line-based three-way merge of sequences against a common base."""
+
+    @classmethod
+    def merge(cls, base, a, b):
+        """
+        Merge changes made in `a` and `b` relative to `base`.
+        Returns (merged, conflicts) where `conflicts` is the number of overlapping hunks
+        that were changed differently on both sides; `merged` keeps the `a` side for them.
+        """
+        merged = []
+        conflicts = 0
+        iz = ia = ib = 0
+
+        for zmatch, zend, amatch, aend, bmatch, bend in cls._find_sync_regions(
+            base, a, b
+        ):
+            base_chunk = base[iz:zmatch]
+            a_chunk = a[ia:amatch]
+            b_chunk = b[ib:bmatch]
+
+            if a_chunk == b_chunk or b_chunk == base_chunk:
+                merged.extend(a_chunk)
+            elif a_chunk == base_chunk:
+                merged.extend(b_chunk)
+            else:
+                conflicts += 1
+                merged.extend(a_chunk)
+
+            merged.extend(a[amatch:aend])
+            iz, ia, ib = zend, aend, bend
+
+        return merged, conflicts
+
+    @classmethod
+    def merge_many(cls, base, sides):
+        """
+        Fold changes of any number of sides into one sequence.
+        Returns (merged, conflicts) like `merge`.
+        """
+        if not sides:
+            return list(base), 0
+
+        merged = list(sides[0])
+        conflicts = 0
+        for side in sides[1:]:
+            merged, side_conflicts = cls.merge(base, merged, side)
+            conflicts += side_conflicts
+        return merged, conflicts
+
+    @staticmethod
+    def _matching_blocks(base, other):
+        return SequenceMatcher(None, base, other, autojunk=False).get_matching_blocks()
+
+    @classmethod
+    def _find_sync_regions(cls, base, a, b):
+        """
+        Return regions unchanged in both sides as
+        (base_start, base_end, a_start, a_end, b_start, b_end) tuples,
+        terminated by an empty region at the end of all sequences.
+        """
+        a_matches = cls._matching_blocks(base, a)
+        b_matches = cls._matching_blocks(base, b)
+
+        regions = []
+        ia = ib = 0
+        while ia < len(a_matches) and ib < len(b_matches):
+            a_base, a_match, a_len = a_matches[ia]
+            b_base, b_match, b_len = b_matches[ib]
+
+            start = max(a_base, b_base)
+            end = min(a_base + a_len, b_base + b_len)
+            if start < end:
+                a_start = a_match + (start - a_base)
+                b_start = b_match + (start - b_base)
+                regions.append(
+                    (
+                        start,
+                        end,
+                        a_start,
+                        a_start + end - start,
+                        b_start,
+                        b_start + end - start,
+                    )
+                )
+
+            if a_base + a_len < b_base + b_len:
+                ia += 1
+            else:
+                ib += 1
+
+        regions.append((len(base), len(base), len(a), len(a), len(b), len(b)))
+        return regions
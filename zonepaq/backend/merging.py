@@ -1,8 +1,11 @@
 import subprocess
 from pathlib import Path
 
+from backend.cfg_parser import CfgMerger, CfgParseError
 from backend.logger import log
+from backend.merge3 import Merge3
 from backend.utilities import Files
+from config.defaults import SUPPORTED_MERGING_ENGINES, TOOLS
 from config.settings_manager import settings
 
 
@@ -10,20 +13,110 @@ class Merging:
     """Provides methods for merging engines."""
 
     @staticmethod
-    def _run_engine(unpacked_files, save_path):
+    def get_engine(merging_engine=None):
+        """Return the key and description of the merging engine selected by its name."""
+        merging_engine = merging_engine or settings.MERGING_ENGINE
+        for key, engine in SUPPORTED_MERGING_ENGINES.items():
+            if engine["name"] == merging_engine:
+                return key, engine
+        return None, None
+
+    @classmethod
+    def get_engine_tool(cls, merging_engine=None):
+        """Return the key of the external tool launched by the merging engine."""
+        key, engine = cls.get_engine(merging_engine)
+        if engine is None:
+            return None
+        return engine.get("fallback", key)
+
+    @classmethod
+    def _run_engine(cls, unpacked_files, save_path, base_file=None, auto_merge=True):
+        """
+        Merge the unpacked files with the selected engine.
+        Without `auto_merge` automatic engines hand the files straight to their tool.
+        """
 
         merging_engine = settings.MERGING_ENGINE
-        tool_paths = settings.TOOLS_PATHS
+        key, engine = cls.get_engine(merging_engine)
+        if engine is None:
+            log.error(f"Unsupported merging engine: {merging_engine}")
+            return False, None
 
         save_path = Path(save_path)
         unpacked_files_paths = [Path(f) for f in unpacked_files]
 
+        if "fallback" in engine:
+            if auto_merge and save_path.suffix.lower() in engine.get("extensions", []):
+                base_path = Path(base_file) if base_file else None
+                sides = [f for f in unpacked_files_paths if f != base_path]
+                if cls._merge_natively(base_path, sides, save_path):
+                    return True, subprocess.CompletedProcess(
+                        args=[merging_engine], returncode=0, stdout="", stderr=""
+                    )
+            key = engine["fallback"]
+
+        return cls._run_tool(key, unpacked_files_paths, save_path)
+
+    @staticmethod
+    def _read_lines(file_path):
+        return Path(file_path).read_bytes().decode("utf-8").splitlines(keepends=True)
+
+    @classmethod
+    def _merge_natively(cls, base_file, sides, save_path):
+        """
+        Merge text files against the vanilla base and save the result.
+        Returns False when the files can't be merged without user input.
+        """
+        try:
+            side_lines = [cls._read_lines(side) for side in sides]
+            if base_file is None:
+                # Nothing to compare against, only identical sides can be merged
+                if any(lines != side_lines[0] for lines in side_lines[1:]):
+                    log.debug(f"No vanilla base for {save_path.name}, can't auto-merge")
+                    return False
+                merged = side_lines[0]
+            else:
+                merged, conflicts = cls._merge_lines(
+                    cls._read_lines(base_file), side_lines, save_path
+                )
+                if conflicts:
+                    log.info(
+                        f"{save_path.name} has {conflicts} conflicting hunks, manual merge is required"
+                    )
+                    return False
+
+            Files.create_dir(save_path.parent)
+            save_path.write_bytes("".join(merged).encode("utf-8"))
+            log.info(f"{save_path.name} merged automatically")
+            return True
+        except UnicodeDecodeError:
+            log.debug(f"{save_path.name} isn't a UTF-8 text file, can't auto-merge")
+        except Exception as e:
+            log.exception(f"Error during automatic merging of {save_path.name}: {e}")
+        return False
+
+    @staticmethod
+    def _merge_lines(base_lines, side_lines, save_path):
+        if save_path.suffix.lower() == ".cfg":
+            # Edits of different properties of the same struct shouldn't conflict
+            try:
+                return CfgMerger.merge_many(base_lines, side_lines)
+            except CfgParseError as e:
+                log.debug(f"Can't merge {save_path.name} by structs: {e}")
+        return Merge3.merge_many(base_lines, side_lines)
+
+    @staticmethod
+    def _run_tool(tool, unpacked_files_paths, save_path):
+        tool_paths = settings.TOOLS_PATHS
+        tool_name = TOOLS[tool]["display_name"]
+
+        engine_path = Path(tool_paths.get(tool))
+        if not Files.is_existing_file_type(engine_path, ".exe"):
+            log.error(f"{tool_name} doesn't exist at {engine_path}")
+            return False, None
+
         # https://manual.winmerge.org/en/Command_line.html
-        if merging_engine == "WinMerge":
-            engine_path = Path(tool_paths.get("winmerge"))
-            if not Files.is_existing_file_type(engine_path, ".exe"):
-                log.error(f"{merging_engine} doesn't exist at {engine_path}")
-                return False, None
+        if tool == "winmerge":
             command = [str(engine_path), "/wl"]
             if len(unpacked_files_paths) == 1:
                 command += ["/self-compare"]
@@ -35,11 +128,7 @@ class Merging:
                 *map(str, unpacked_files_paths),
             ]
 
-        elif merging_engine == "KDiff3":
-            engine_path = Path(tool_paths.get("kdiff3"))
-            if not Files.is_existing_file_type(engine_path, ".exe"):
-                log.error(f"{merging_engine} doesn't exist at {engine_path}")
-                return False, None
+        elif tool == "kdiff3":
             command = [
                 str(engine_path),
                 "-o",
@@ -47,7 +136,7 @@ class Merging:
                 *map(str, unpacked_files_paths),
             ]
         else:
-            log.error(f"Unsupported merging engine: {merging_engine}")
+            log.error(f"Unsupported merging tool: {tool_name}")
             return False, None
 
         try:
@@ -58,3 +147,4 @@ class Merging:
             log.error(f"Merging tool not found: {e}")
         except Exception as e:
             log.exception(f"Error during merging: {e}")
+        return False, None
@@ -0,0 +1,146 @@
+import atexit
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from backend.logger import log
+from backend.utilities import Files
+from config.settings_manager import settings
+
+
+class PakIndexCache:
+    """Persistent LRU cache of pak listings, keyed by absolute path, size and mtime."""
+
+    _instance = None
+    _lock = threading.Lock()
+
+    VERSION = 1
+
+    def __new__(cls, *args, **kwargs):
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = super().__new__(cls)
+                cls._instance.initialize()
+        return cls._instance
+
+    def initialize(self):
+        cache_settings = settings.CACHE["pak_index"]
+        self.cache_file = Path(cache_settings["file"])
+        self.max_paks = cache_settings["max_paks"]
+        self.max_entries = cache_settings["max_entries"]
+
+        self.lock = threading.Lock()
+        self.records = OrderedDict()  # least recently used first
+        self.total_entries = 0
+        self.dirty = False
+
+        self.load()
+        atexit.register(self.save)
+
+    @staticmethod
+    def _stat(file):
+        path = Path(file).absolute()
+        stat = path.stat()
+        return str(path), stat.st_size, stat.st_mtime_ns
+
+    def load(self):
+        with self.lock:
+            self.records.clear()
+            self.total_entries = 0
+            if not self.cache_file.is_file():
+                return
+            try:
+                with self.cache_file.open("r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("version") != self.VERSION:
+                    log.debug("Pak index cache version changed, starting over.")
+                    return
+                for record in data.get("paks", []):
+                    self.records[record["path"]] = record
+                    self.total_entries += len(record["entries"])
+                log.debug(f"Loaded {len(self.records)} pak listings from cache.")
+            except Exception as e:
+                log.warning(f"Pak index cache is unreadable, starting over: {e}")
+                self.records.clear()
+                self.total_entries = 0
+
+    def save(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            try:
+                Files.create_dir(self.cache_file.parent)
+                temp_file = self.cache_file.with_suffix(".tmp")
+                with temp_file.open("w", encoding="utf-8") as f:
+                    json.dump(
+                        {"version": self.VERSION, "paks": list(self.records.values())},
+                        f,
+                        ensure_ascii=False,
+                        separators=(",", ":"),
+                    )
+                os.replace(temp_file, self.cache_file)
+                self.dirty = False
+                log.debug(f"Saved {len(self.records)} pak listings to cache.")
+            except Exception as e:
+                log.error(f"Failed to save pak index cache: {e}")
+
+    def get(self, file):
+        """Return cached entries of an unchanged pak or None."""
+        try:
+            path, size, mtime_ns = self._stat(file)
+        except OSError:
+            return None
+
+        with self.lock:
+            record = self.records.get(path)
+            if not record:
+                return None
+            if record["size"] != size or record["mtime_ns"] != mtime_ns:
+                self._remove(path)
+                return None
+            # Hits only reorder records, the order is saved along with the next change
+            # instead of rewriting every listing after each analysis
+            self.records.move_to_end(path)
+            return record["entries"]
+
+    def put(self, file, entries):
+        try:
+            path, size, mtime_ns = self._stat(file)
+        except OSError:
+            return
+
+        with self.lock:
+            self._remove(path)
+            self.records[path] = {
+                "path": path,
+                "size": size,
+                "mtime_ns": mtime_ns,
+                "entries": entries,
+            }
+            self.total_entries += len(entries)
+            self.dirty = True
+            self._evict()
+
+    def clear(self):
+        with self.lock:
+            self.records.clear()
+            self.total_entries = 0
+            self.dirty = True
+
+    def _remove(self, path):
+        # Must be called with self.lock held
+        record = self.records.pop(path, None)
+        if record:
+            self.total_entries -= len(record["entries"])
+            self.dirty = True
+
+    def _evict(self):
+        # Must be called with self.lock held
+        while self.records and (
+            len(self.records) > self.max_paks or self.total_entries > self.max_entries
+        ):
+            path, record = self.records.popitem(last=False)
+            self.total_entries -= len(record["entries"])
+            log.debug(f"Evicted {path} from pak index cache.")
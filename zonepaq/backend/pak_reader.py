@@ -0,0 +1,543 @@
+import hashlib
+import io
+import mmap
+import shutil
+import struct
+import zlib
+from pathlib import Path
+
+from backend.logger import log
+
+
+class UnsupportedPakError(ValueError):
+    """Raised when a pak can't be read natively and repak should be used instead."""
+
+
+class PakEntry:
+    """Single file record of a pak index."""
+
+    __slots__ = (
+        "path",
+        "offset",
+        "compressed_size",
+        "uncompressed_size",
+        "compression",
+        "compression_blocks",
+        "compression_block_size",
+        "encrypted",
+        "hash",
+    )
+
+    def __init__(
+        self,
+        path,
+        offset,
+        compressed_size,
+        uncompressed_size,
+        compression=None,
+        compression_blocks=None,
+        compression_block_size=0,
+        encrypted=False,
+        hash=None,
+    ):
+        self.path = path
+        self.offset = offset
+        self.compressed_size = compressed_size
+        self.uncompressed_size = uncompressed_size
+        self.compression = compression
+        # (start, end) pairs, relative to entry offset
+        self.compression_blocks = compression_blocks or []
+        self.compression_block_size = compression_block_size
+        self.encrypted = encrypted
+        self.hash = hash
+
+    @property
+    def header_size(self):
+        """Size of the entry record serialized in front of the entry data."""
+        size = 8 + 8 + 8 + 4 + 20 + 1 + 4
+        if self.compression:
+            size += 4 + 16 * len(self.compression_blocks)
+        return size
+
+    def __repr__(self):
+        return f"PakEntry({self.path!r}, size={self.uncompressed_size}, compression={self.compression})"
+
+
+class PakIndex:
+    """Parsed footer and index of a pak."""
+
+    def __init__(self, path, version, mount_point, compression_methods, entries):
+        self.path = Path(path)
+        self.version = version
+        self.mount_point = mount_point
+        self.compression_methods = compression_methods
+        self.entries = entries
+
+
+class _ByteReader:
+    def __init__(self, data, position=0):
+        self.data = data
+        self.position = position
+
+    def read(self, size):
+        if self.position + size > len(self.data):
+            raise UnsupportedPakError("unexpected end of index data")
+        chunk = self.data[self.position : self.position + size]
+        self.position += size
+        return chunk
+
+    def unpack(self, fmt):
+        try:
+            values = struct.unpack_from(fmt, self.data, self.position)
+        except struct.error:
+            raise UnsupportedPakError("unexpected end of index data")
+        self.position += struct.calcsize(fmt)
+        return values
+
+    def u8(self):
+        return self.unpack("<B")[0]
+
+    def u32(self):
+        return self.unpack("<I")[0]
+
+    def i32(self):
+        return self.unpack("<i")[0]
+
+    def u64(self):
+        return self.unpack("<Q")[0]
+
+    def fstring(self):
+        length = self.i32()
+        if length == 0:
+            return ""
+        if length > 0:
+            return self.read(length)[:-1].decode("utf-8", errors="replace")
+        return self.read(-length * 2)[:-2].decode("utf-16-le", errors="replace")
+
+
+class PakReader:
+    """Reads footer and index of V10/V11 paks without spawning repak."""
+
+    MAGIC = 0x5A6F12E1
+    SUPPORTED_VERSIONS = (10, 11)
+    # guid + encrypted flag + magic + version + index offset/size/hash + 5 compression names
+    FOOTER_SIZE = 16 + 1 + 4 + 4 + 8 + 8 + 20 + 5 * 32
+    STRIP_PREFIX = "../../../"
+    # Marks a removed entry in the full directory index
+    INVALID_OFFSET = -0x80000000
+    AES_BLOCK_SIZE = 16
+
+    @classmethod
+    def read_index(cls, file, with_hashes=False, aes_key=None, extensions=None):
+        """
+        Parse the pak index. Entry paths are returned the same way `repak list` prints them.
+        With `extensions` only entries of these types are kept, case-insensitively.
+        With `with_hashes` SHA1 hashes are read from entry records in front of the entry data.
+        Encrypted indexes are decrypted with `aes_key` when the cryptography package is available.
+        """
+        file = Path(file)
+        with open(file, "rb") as f:
+            f.seek(0, 2)
+            file_size = f.tell()
+            if file_size < cls.FOOTER_SIZE:
+                raise UnsupportedPakError("file is too small to be a pak")
+
+            f.seek(file_size - cls.FOOTER_SIZE)
+            footer = f.read(cls.FOOTER_SIZE)
+            (
+                version,
+                compression_methods,
+                index_offset,
+                index_size,
+                index_hash,
+                encrypted,
+            ) = cls._read_footer(footer)
+
+            cipher = cls._get_cipher(aes_key) if encrypted else None
+
+            f.seek(index_offset)
+            index_data = f.read(index_size)
+            if len(index_data) != index_size:
+                raise UnsupportedPakError("pak index is truncated")
+            if cipher:
+                index_data = cls._decrypt(cipher, index_data)
+                if hashlib.sha1(index_data).digest() != index_hash:
+                    raise UnsupportedPakError(
+                        "pak index can't be decrypted with this key"
+                    )
+
+            mount_point, entries_data, fdi_location = cls._read_primary_index(
+                index_data, compression_methods
+            )
+
+            fdi_offset, fdi_size = fdi_location
+            f.seek(fdi_offset)
+            # Encrypted data is stored padded to the AES block size
+            fdi_data = f.read(cls._align(fdi_size) if cipher else fdi_size)
+            if len(fdi_data) < fdi_size:
+                raise UnsupportedPakError("full directory index is truncated")
+            if cipher:
+                fdi_data = cls._decrypt(cipher, fdi_data)[:fdi_size]
+
+            entries = cls._read_full_directory_index(
+                fdi_data, mount_point, entries_data, compression_methods
+            )
+
+            if extensions is not None:
+                # Filtered before hashing, each hash costs a seek into the entry data
+                extensions = tuple(extension.lower() for extension in extensions)
+                entries = {
+                    path: entry
+                    for path, entry in entries.items()
+                    if path.lower().endswith(extensions)
+                }
+
+            if with_hashes:
+                for entry in entries.values():
+                    if entry.hash is None:
+                        f.seek(entry.offset + 28)
+                        entry.hash = cls._parse_hash(f.read(20))
+
+        log.debug(f"Read index of {str(file)}: {len(entries)} entries.")
+        return PakIndex(file, version, mount_point, compression_methods, entries)
+
+    @classmethod
+    def _read_footer(cls, footer):
+        reader = _ByteReader(footer, 16)
+        encrypted = reader.u8() != 0
+        magic, version = reader.unpack("<II")
+        if magic != cls.MAGIC:
+            raise UnsupportedPakError("pak magic isn't found, probably an old version")
+        if version not in cls.SUPPORTED_VERSIONS:
+            raise UnsupportedPakError(f"pak version {version} isn't supported")
+        index_offset, index_size = reader.unpack("<QQ")
+        index_hash = reader.read(20)
+        compression_methods = [
+            reader.read(32).split(b"\0", 1)[0].decode("ascii", errors="replace")
+            for _ in range(5)
+        ]
+        return (
+            version,
+            compression_methods,
+            index_offset,
+            index_size,
+            index_hash,
+            encrypted,
+        )
+
+    @classmethod
+    def _align(cls, size):
+        return (size + cls.AES_BLOCK_SIZE - 1) & ~(cls.AES_BLOCK_SIZE - 1)
+
+    @staticmethod
+    def _get_cipher(aes_key):
+        if not aes_key:
+            raise UnsupportedPakError("pak index is encrypted")
+        try:
+            from cryptography.hazmat.primitives.ciphers import (
+                Cipher,
+                algorithms,
+                modes,
+            )
+        except ImportError:
+            raise UnsupportedPakError(
+                "pak index is encrypted and cryptography isn't installed"
+            )
+
+        key = aes_key.strip()
+        if key[:2].lower() == "0x":
+            key = key[2:]
+        try:
+            key = bytes.fromhex(key)
+        except ValueError:
+            raise UnsupportedPakError("AES key isn't a hex string")
+        if len(key) != 32:
+            raise UnsupportedPakError("AES key isn't 256 bits long")
+        return Cipher(algorithms.AES(key), modes.ECB())
+
+    @classmethod
+    def _decrypt(cls, cipher, data):
+        if len(data) % cls.AES_BLOCK_SIZE:
+            raise UnsupportedPakError("encrypted data isn't aligned to AES blocks")
+        decryptor = cipher.decryptor()
+        return decryptor.update(data) + decryptor.finalize()
+
+    @classmethod
+    def _read_primary_index(cls, index_data, compression_methods):
+        reader = _ByteReader(index_data)
+        mount_point = reader.fstring()
+        reader.u32()  # entry count
+        reader.u64()  # path hash seed
+
+        if reader.u32():
+            reader.unpack("<QQ")  # path hash index offset and size
+            reader.read(20)
+
+        if not reader.u32():
+            raise UnsupportedPakError("pak has no full directory index")
+        fdi_location = reader.unpack("<QQ")
+        reader.read(20)
+
+        encoded_entries = reader.read(reader.u32())
+        files = [
+            cls._read_entry_record(reader, compression_methods)
+            for _ in range(reader.u32())
+        ]
+        return mount_point, (encoded_entries, files), fdi_location
+
+    @classmethod
+    def _read_full_directory_index(
+        cls, fdi_data, mount_point, entries_data, compression_methods
+    ):
+        encoded_entries, files = entries_data
+        reader = _ByteReader(fdi_data)
+        entries = {}
+        for _ in range(reader.u32()):
+            dir_name = reader.fstring()
+            if dir_name.startswith("/"):
+                dir_name = dir_name[1:]
+            for _ in range(reader.u32()):
+                file_name = reader.fstring()
+                encoded_offset = reader.i32()
+                if encoded_offset == cls.INVALID_OFFSET:
+                    continue
+
+                if encoded_offset >= 0:
+                    if encoded_offset >= len(encoded_entries):
+                        raise UnsupportedPakError(
+                            f"encoded entry offset {encoded_offset} is out of range"
+                        )
+                    entry = cls._decode_entry(
+                        encoded_entries, encoded_offset, compression_methods
+                    )
+                else:
+                    if -encoded_offset > len(files):
+                        raise UnsupportedPakError(
+                            f"entry record #{-encoded_offset - 1} is out of range"
+                        )
+                    entry = files[-encoded_offset - 1]
+
+                entry.path = cls._strip_prefix(mount_point + dir_name + file_name)
+                entries[entry.path] = entry
+        return entries
+
+    @classmethod
+    def _strip_prefix(cls, path):
+        path = path.replace("\\", "/")
+        if path.startswith(cls.STRIP_PREFIX):
+            return path[len(cls.STRIP_PREFIX) :]
+        return path.lstrip("/")
+
+    @staticmethod
+    def _compression_name(index, compression_methods):
+        # Compression is stored as 1-based index into the footer names, 0 means none
+        if not index:
+            return None
+        if index > len(compression_methods):
+            raise UnsupportedPakError(f"unknown compression method #{index}")
+        return compression_methods[index - 1] or f"#{index}"
+
+    @staticmethod
+    def _parse_hash(hash_bytes):
+        if len(hash_bytes) != 20 or not any(hash_bytes):
+            return None
+        return hash_bytes.hex()
+
+    @classmethod
+    def _read_entry_record(cls, reader, compression_methods):
+        offset, compressed_size, uncompressed_size = reader.unpack("<QQQ")
+        compression = cls._compression_name(reader.u32(), compression_methods)
+        entry_hash = cls._parse_hash(reader.read(20))
+        blocks = []
+        if compression:
+            blocks = [reader.unpack("<QQ") for _ in range(reader.u32())]
+        encrypted = bool(reader.u8() & 1)
+        block_size = reader.u32()
+        return PakEntry(
+            None,
+            offset,
+            compressed_size,
+            uncompressed_size,
+            compression,
+            blocks,
+            block_size,
+            encrypted,
+            entry_hash,
+        )
+
+    @classmethod
+    def _decode_entry(cls, encoded_entries, position, compression_methods):
+        reader = _ByteReader(encoded_entries, position)
+        bits = reader.u32()
+
+        compression = cls._compression_name((bits >> 23) & 0x3F, compression_methods)
+        encrypted = bool(bits & (1 << 22))
+        block_count = (bits >> 6) & 0xFFFF
+        block_size = bits & 0x3F
+        if block_size == 0x3F:
+            block_size = reader.u32()
+        else:
+            block_size <<= 11
+
+        def var_int(bit):
+            return reader.u32() if bits & (1 << bit) else reader.u64()
+
+        offset = var_int(31)
+        uncompressed_size = var_int(30)
+        compressed_size = var_int(29) if compression else uncompressed_size
+
+        entry = PakEntry(
+            None,
+            offset,
+            compressed_size,
+            uncompressed_size,
+            compression,
+            None,
+            block_size,
+            encrypted,
+        )
+
+        if compression:
+            # Block offsets are relative to the entry and start right after its record
+            entry.compression_blocks = [(0, 0)] * block_count
+            start = entry.header_size
+            if block_count == 1 and not encrypted:
+                blocks = [(start, start + compressed_size)]
+            else:
+                blocks = []
+                for _ in range(block_count):
+                    size = reader.u32()
+                    blocks.append((start, start + size))
+                    start += (size + 15) & ~15 if encrypted else size
+            entry.compression_blocks = blocks
+
+        return entry
+
+
+class PakEntryReader(io.RawIOBase):
+    """Streams decompressed data of a compressed entry one block at a time."""
+
+    DECOMPRESSORS = {
+        "Zlib": lambda data: zlib.decompress(data),
+        "Gzip": lambda data: zlib.decompress(data, 31),
+    }
+
+    def __init__(self, view, entry):
+        super().__init__()
+        if entry.compression not in self.DECOMPRESSORS:
+            raise UnsupportedPakError(
+                f"{entry.compression} compression isn't supported natively"
+            )
+        self._view = view
+        self._entry = entry
+        self._decompress = self.DECOMPRESSORS[entry.compression]
+        self._block_index = 0
+        self._pending = b""
+        self._pending_position = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while self._pending_position >= len(self._pending):
+            if self._block_index >= len(self._entry.compression_blocks):
+                return 0
+            start, end = self._entry.compression_blocks[self._block_index]
+            self._block_index += 1
+            offset = self._entry.offset
+            self._pending = self._decompress(self._view[offset + start : offset + end])
+            self._pending_position = 0
+
+        size = min(len(buffer), len(self._pending) - self._pending_position)
+        buffer[:size] = self._pending[
+            self._pending_position : self._pending_position + size
+        ]
+        self._pending_position += size
+        return size
+
+
+class PakFile:
+    """
+    Memory-mapped pak with zero-copy access to entries.
+    Stored entries are exposed as memoryviews, compressed ones as streaming readers.
+    """
+
+    def __init__(self, file, index=None):
+        self.path = Path(file)
+        # An index already read by the caller spares parsing it again
+        self.index = index if index is not None else PakReader.read_index(self.path)
+        self._file = open(self.path, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            # e.g. the pak was truncated after its index was read
+            self._file.close()
+            raise
+        self._view = memoryview(self._mmap)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        try:
+            self._view.release()
+            self._mmap.close()
+        except BufferError:
+            # Some entry views are still referenced, mapping is freed with them
+            log.debug(f"{str(self.path)} is still in use, leaving it mapped.")
+        self._file.close()
+
+    @property
+    def entries(self):
+        return self.index.entries
+
+    def open(self, path):
+        """Return a memoryview for stored entries or a binary stream for compressed ones."""
+        entry = self.entries[path]
+        if entry.encrypted:
+            raise UnsupportedPakError(f"{path} is encrypted")
+
+        if not entry.compression:
+            start = entry.offset + entry.header_size
+            return self._view[start : start + entry.uncompressed_size]
+
+        return io.BufferedReader(PakEntryReader(self._view, entry))
+
+    def read(self, path):
+        data = self.open(path)
+        if isinstance(data, memoryview):
+            return data.tobytes()
+        with data:
+            return data.read()
+
+    def hash_entry(self, path, algorithm="sha1"):
+        """Hash of uncompressed entry data."""
+        hasher = hashlib.new(algorithm)
+        data = self.open(path)
+        if isinstance(data, memoryview):
+            hasher.update(data)
+        else:
+            with data:
+                for chunk in iter(lambda: data.read(1024 * 1024), b""):
+                    hasher.update(chunk)
+        return hasher.hexdigest()
+
+    def extract(self, path, destination):
+        """Write a single entry to destination, keeping its relative path."""
+        if ".." in Path(path).parts:
+            raise UnsupportedPakError(f"{path} points outside of the pak")
+
+        target = Path(destination) / path
+        target.parent.mkdir(parents=True, exist_ok=True)
+
+        data = self.open(path)
+        with open(target, "wb") as f:
+            if isinstance(data, memoryview):
+                f.write(data)
+            else:
+                with data:
+                    shutil.copyfileobj(data, f, length=1024 * 1024)
+        return target
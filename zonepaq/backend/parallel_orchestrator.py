@@ -1,122 +1,518 @@
-import itertools
+import asyncio
+import atexit
 import logging as log
 import os
+import queue
+import re
+import signal
 import subprocess
+import sys
 import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures import wait
+from contextlib import contextmanager
+from pathlib import Path
 from threading import Lock
 
+from backend.event_bus import TaskProgress
 from backend.logger import log
+from backend.utilities import Files
+from config.settings_manager import settings
+
+
+class OperationCancelled(Exception):
+    """Raised by operations that noticed their cancellation token was cancelled."""
+
+
+class CancellationToken(threading.Event):
+    """
+    Shared by the caller and a background operation to ask the operation to stop.
+    It's an event, so it can be passed wherever a `cancel_event` is expected.
+    A token with a parent is cancelled along with it, as seen by `is_set()` polling.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__()
+        self.parent = parent
+
+    def is_set(self):
+        return super().is_set() or (self.parent is not None and self.parent.is_set())
+
+    def cancel(self):
+        if not self.is_set():
+            log.info("Cancellation requested.")
+        self.set()
+
+    @property
+    def is_cancelled(self):
+        return self.is_set()
+
+    def raise_if_cancelled(self):
+        if self.is_set():
+            raise OperationCancelled("Cancelled")
 
 
 class ThreadExecutor:
     def __init__(self, max_workers=None):
-        self.executor = ThreadPoolExecutor(max_workers=max_workers or os.cpu_count())
+        self.max_workers = max_workers or os.cpu_count()
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
         self.lock = Lock()
 
     def run(self, func, *args, **kwargs):
         return self.executor.submit(func, *args, **kwargs)
 
-    def shutdown(self):
-        self.executor.shutdown(wait=True)
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.executor.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+
+class ExecutorRegistry:
+    """Application-wide named thread pools, shut down on exit."""
+
+    _instance = None
+    _lock = threading.Lock()
+
+    POOL_SIZES = {
+        # Reading pak indexes, hashing and copying files
+        "io": min(32, (os.cpu_count() or 1) + 4),
+        # Waiting for repak processes, each of them is busy on its own
+        "subprocess": max(2, (os.cpu_count() or 1) // 2),
+        "cpu": os.cpu_count() or 1,
+        # Kept apart, so prefetching never delays work that is waited for
+        "prefetch": 2,
+    }
+
+    def __new__(cls, *args, **kwargs):
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = super().__new__(cls)
+                cls._instance.initialize()
+        return cls._instance
+
+    def initialize(self):
+        self.lock = threading.Lock()
+        self.executors = {}
+        self.closed = False
+        atexit.register(self.shutdown)
+
+    def get(self, name):
+        """Return the shared executor of the named pool, creating it on first use."""
+        if name not in self.POOL_SIZES:
+            raise ValueError(f"Unknown executor pool: {name}")
+        with self.lock:
+            if self.closed:
+                raise RuntimeError("Executors are already shut down")
+            if name not in self.executors:
+                self.executors[name] = ThreadExecutor(max_workers=self.POOL_SIZES[name])
+                log.debug(
+                    f"Created {name} executor with {self.POOL_SIZES[name]} workers."
+                )
+            return self.executors[name]
+
+    def shutdown(self, wait=False, cancel_futures=True):
+        with self.lock:
+            self.closed = True
+            executors = list(self.executors.items())
+            self.executors.clear()
+        for name, executor in executors:
+            log.debug(f"Shutting down {name} executor...")
+            executor.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+
+class FailureClassifier:
+    """Sorts task failures into kinds that deserve different retry policies."""
+
+    TRANSIENT = "transient"
+    TIMEOUT = "timeout"
+    CORRUPT = "corrupt"
+    DETERMINISTIC = "deterministic"
+    UNKNOWN = "unknown"
+
+    # (retries, base delay of the exponential backoff in seconds)
+    RETRY_POLICIES = {
+        # Windows file locks held by antiviruses or indexers are usually released quickly
+        TRANSIENT: (3, 0.2),
+        TIMEOUT: (1, 1),
+        # Retrying a broken pak or a missing key gives the same result
+        CORRUPT: (0, 0),
+        DETERMINISTIC: (0, 0),
+        UNKNOWN: (1, 0.5),
+    }
+
+    PATTERNS = [
+        (
+            TRANSIENT,
+            re.compile(
+                r"being used by another process|access is denied|permission denied"
+                r"|resource busy|winerror (5|32|33)\b|errno (11|13|16)\b",
+                re.IGNORECASE,
+            ),
+        ),
+        (TIMEOUT, re.compile(r"timeout|timed out|stalled", re.IGNORECASE)),
+        (
+            CORRUPT,
+            re.compile(
+                r"corrupt|magic|failed to fill whole buffer|unexpected end of file"
+                r"|unsupported pak|invalid (index|footer|data)|decompress",
+                re.IGNORECASE,
+            ),
+        ),
+        (
+            DETERMINISTIC,
+            re.compile(
+                r"cancelled|encrypted|aes key|no such file|not found|doesn't exist"
+                r"|is a directory|not a directory|invalid argument",
+                re.IGNORECASE,
+            ),
+        ),
+    ]
+
+    @classmethod
+    def classify(cls, error):
+        """Return the kind of a failure given as an exception or an error message."""
+        if error is None:
+            # Tasks return no message for failures they've already reported, e.g. a missing key
+            return cls.DETERMINISTIC
+        if isinstance(error, (TimeoutError, FutureTimeoutError)):
+            return cls.TIMEOUT
+        if isinstance(
+            error, (FileNotFoundError, IsADirectoryError, NotADirectoryError)
+        ):
+            return cls.DETERMINISTIC
+        if isinstance(error, OperationCancelled):
+            return cls.DETERMINISTIC
+
+        message = str(error)
+        for kind, pattern in cls.PATTERNS:
+            if pattern.search(message):
+                return kind
+        if isinstance(error, PermissionError):
+            return cls.TRANSIENT
+        return cls.UNKNOWN
+
+    @classmethod
+    def get_retry_delay(cls, kind, attempt):
+        """Delay before the next attempt, or None when the failure shouldn't be retried."""
+        retries, base_delay = cls.RETRY_POLICIES[kind]
+        if attempt > retries:
+            return None
+        return Files._calculate_backoff(attempt, base_delay)
 
 
 class TaskRetryManager:
+    # How often a cancellation token is checked while waiting for tasks
+    CANCEL_POLL = 0.5
+
     def __init__(self, executor: ThreadExecutor):
         self.executor = executor
-        self.lock = Lock()
 
     def execute_tasks_with_retries(
-        self, files, func, batch_size=10, timeout=13, max_retries=2
+        self,
+        files,
+        func,
+        max_in_flight=None,
+        timeout=None,
+        max_retries=2,
+        on_result=None,
+        task_name=None,
+        cancel_token=None,
     ):
+        """
+        Run `func(file) -> (success, result)` for all files, keeping up to `max_in_flight` tasks
+        submitted and submitting the next one as soon as any of them finishes.
+        With `timeout`, `func` is called with a `cancel_token` keyword as well: a token of the attempt,
+        cancelled once it runs longer than `timeout` seconds. The attempt is retried only after it stops.
+        Failures are retried with exponential backoff according to their kind (see `FailureClassifier`),
+        but never more than `max_retries` times.
+        `on_result(file, success, result)` is called as soon as every file is settled.
+        Progress is published to the event bus under `task_name`.
+        Once `cancel_token` is cancelled, files that haven't started are settled as cancelled
+        and running ones are waited for, `func` is expected to watch the same token.
+        """
         results_ok = {}
         results_ko = {}
-        futures = {}
-        retry_count = {}
+        pending = deque(files)
+        delayed = []  # (ready time, file) of failed files waiting for their retry
+        attempts = {}
+        in_flight = {}  # future: attempt
+        max_in_flight = max_in_flight or self.executor.max_workers
+        task = TaskProgress(
+            task_name or getattr(func, "__name__", "tasks"), total=len(pending)
+        )
+        task.start()
+
+        def settle(file, success, result):
+            if success:
+                results_ok[file] = result
+            else:
+                results_ko[file] = result
+            task.advance(count=1, message=str(file))
+            if on_result:
+                try:
+                    on_result(file, success, result)
+                except Exception as e:
+                    log.error(f"Result callback failed for {file}: {e}")
+
+        def run_attempt(attempt):
+            # Time spent queued in the pool doesn't count against the timeout
+            attempt["started"] = time.monotonic()
+            if timeout:
+                return func(attempt["file"], cancel_token=attempt["token"])
+            return func(attempt["file"])
+
+        def fail(file, error):
+            kind = FailureClassifier.classify(error)
+            delay = None
+            if attempts[file] <= max_retries and not (
+                cancel_token is not None and cancel_token.is_cancelled
+            ):
+                delay = FailureClassifier.get_retry_delay(kind, attempts[file])
+            if delay is None:
+                log.error(
+                    f"Giving up on {file} after {attempts[file]} attempts ({kind}): {error}"
+                )
+                settle(file, False, str(error) if error is not None else None)
+            else:
+                log.warning(f"Retrying {file} in {delay:.1f}s ({kind}): {error}")
+                delayed.append((time.monotonic() + delay, file))
 
         try:
-            for batch in itertools.zip_longest(*[iter(files)] * batch_size):
-                batch = list(filter(None, batch))
-                if not batch:
-                    break
+            while pending or in_flight or delayed:
+                now = time.monotonic()
+                for ready in [entry for entry in delayed if entry[0] <= now]:
+                    delayed.remove(ready)
+                    pending.append(ready[1])
+
+                while pending and len(in_flight) < max_in_flight:
+                    file = pending.popleft()
+                    attempts[file] = attempts.get(file, 0) + 1
+                    attempt = {
+                        "file": file,
+                        "token": CancellationToken(parent=cancel_token),
+                        "started": None,
+                        "expired": False,
+                    }
+                    in_flight[self.executor.run(run_attempt, attempt)] = attempt
 
-                with self.lock:
-                    futures.update(
-                        {self.executor.run(func, file): file for file in batch}
+                wake_times = [ready_time for ready_time, _ in delayed]
+                if timeout:
+                    for attempt in in_flight.values():
+                        if attempt["expired"]:
+                            continue
+                        if attempt["started"] is None:
+                            # Its deadline is known only once it starts
+                            wake_times.append(time.monotonic() + self.CANCEL_POLL)
+                        else:
+                            wake_times.append(attempt["started"] + timeout)
+                wait_time = None
+                if wake_times:
+                    wait_time = max(0, min(wake_times) - time.monotonic())
+                if cancel_token is not None:
+                    wait_time = (
+                        self.CANCEL_POLL
+                        if wait_time is None
+                        else min(wait_time, self.CANCEL_POLL)
                     )
 
-                for future in as_completed(futures):
-                    file = None
-                    with self.lock:
-                        file = futures.pop(future, None)
+                if in_flight:
+                    done, _ = wait(
+                        in_flight, timeout=wait_time, return_when=FIRST_COMPLETED
+                    )
+                else:
+                    done = set()
+                    time.sleep(wait_time or 0)
 
-                    if not file:
-                        continue
+                for future in done:
+                    attempt = in_flight.pop(future)
+                    file = attempt["file"]
                     try:
-                        success, result = future.result(timeout=timeout)
-                        with self.lock:
-                            if success:
-                                results_ok[file] = result
-                            else:
-                                results_ko[file] = result
-                    except TimeoutError:
-                        with self.lock:
-                            retry_count[file] = retry_count.get(file, 0) + 1
-
-                        if retry_count[file] <= max_retries:
+                        success, result = future.result()
+                    except Exception as e:
+                        success, result = False, e
+                    if success:
+                        settle(file, True, result)
+                    elif attempt["expired"]:
+                        fail(file, TimeoutError("Timeout"))
+                    else:
+                        fail(file, result)
+
+                if timeout:
+                    now = time.monotonic()
+                    for attempt in in_flight.values():
+                        if (
+                            not attempt["expired"]
+                            and attempt["started"] is not None
+                            and attempt["started"] + timeout <= now
+                        ):
+                            # Retried once it stops, so the same file is never processed twice at once
                             log.warning(
-                                f"Retrying {file} (attempt {retry_count[file]})"
+                                f"{attempt['file']} timed out, cancelling the attempt..."
                             )
-                            with self.lock:
-                                futures[self.executor.run(func, file)] = file
-                        else:
-                            log.error(f"Timeout after retries for {file}")
-                            with self.lock:
-                                results_ko[file] = "Timeout"
-                    except Exception as e:
-                        log.error(f"Error processing {file}: {e}")
-                        with self.lock:
-                            results_ko[file] = str(e)
+                            attempt["expired"] = True
+                            attempt["token"].cancel()
+
+                if cancel_token is not None and cancel_token.is_cancelled:
+                    while pending:
+                        settle(pending.popleft(), False, "Cancelled")
+                    while delayed:
+                        settle(delayed.pop()[1], False, "Cancelled")
+                    for future, attempt in list(in_flight.items()):
+                        if future.cancel():
+                            del in_flight[future]
+                            settle(attempt["file"], False, "Cancelled")
+        except BaseException as e:
+            task.fail(str(e))
+            raise
         finally:
-            with self.lock:
-                for future in futures:
-                    if not future.done():
-                        future.cancel()
-                # ! calling in between calls breaks the loop. was previously outside `with self.lock`
-                # if all(retry_count[file] > max_retries for file in retry_count):
-                #     self.executor.shutdown()
+            for future in in_flight:
+                future.cancel()
 
+        if cancel_token is not None and cancel_token.is_cancelled:
+            task.fail("Cancelled")
+        else:
+            task.finish(f"{len(results_ko)} failed" if results_ko else None)
         return results_ok, results_ko
 
 
 class ThreadManager:
     @staticmethod
-    def run_in_thread_with_result(target_func, timeout=3, *args, **kwargs):
-        result_container = {}
+    def run_in_background(target_func, daemon=True, *args, **kwargs):
+        thread = threading.Thread(
+            target=target_func, args=args, kwargs=kwargs, daemon=daemon
+        )
+        thread.start()
+        return thread
+
+
+class ConcurrencyGovernor:
+    """
+    Limits simultaneous disk-heavy jobs per device and adapts the limit to observed throughput.
+    The limit starts low and climbs while throughput keeps improving, backing off when it drops.
+    """
+
+    _instance = None
+    _lock = threading.Lock()
 
-        def wrapper():
+    INITIAL_LIMIT = 2
+    # Relative throughput change treated as noise
+    TOLERANCE = 0.1
+
+    def __new__(cls, *args, **kwargs):
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = super().__new__(cls)
+                cls._instance.initialize()
+        return cls._instance
+
+    def initialize(self):
+        self.lock = threading.Lock()
+        self.devices = {}
+
+    @staticmethod
+    def get_max_limit():
+        """Upper bound of the limit from settings, "Auto" stands for the number of CPUs."""
+        value = str(settings.MAX_REPAK_PROCESSES)
+        if value.isdigit() and int(value) > 0:
+            return int(value)
+        return os.cpu_count() or 1
+
+    @staticmethod
+    def _get_device(path):
+        path = Path(path).absolute()
+        for candidate in (path, *path.parents):
             try:
-                target_func(result_container, *args, **kwargs)
-            except Exception as e:
-                result_container["exception"] = e
+                return os.stat(candidate).st_dev
+            except OSError:
+                continue
+        return None
 
-        thread = threading.Thread(target=wrapper)
-        thread.start()
-        thread.join(timeout=timeout)
+    def _get_state(self, device):
+        with self.lock:
+            if device not in self.devices:
+                self.devices[device] = {
+                    "condition": threading.Condition(),
+                    "limit": min(self.INITIAL_LIMIT, self.get_max_limit()),
+                    "active": 0,
+                    "direction": 1,
+                    # Time without any job running, left out of throughput, so pauses
+                    # between batches started by the user don't look like a slowdown
+                    "idle_time": 0.0,
+                    "idle_since": time.monotonic(),
+                    "window_start": None,
+                    "window_bytes": 0,
+                    "window_jobs": 0,
+                    "last_throughput": None,
+                }
+            return self.devices[device]
 
-        if thread.is_alive():
-            log.error("Timeout expired for thread execution.")
-            result_container["timeout"] = True
+    @contextmanager
+    def slot(self, path, size=None):
+        """
+        Wait for a free slot on the device holding `path` for the duration of the block.
+        `size` of processed data in bytes lets the limit adapt, jobs without it are only limited.
+        """
+        state = self._get_state(self._get_device(path))
+        condition = state["condition"]
 
-        return result_container
+        with condition:
+            while state["active"] >= min(state["limit"], self.get_max_limit()):
+                condition.wait()
+            if not state["active"]:
+                state["idle_time"] += time.monotonic() - state["idle_since"]
+            state["active"] += 1
+            started = self._get_busy_time(state)
+
+        try:
+            yield
+        finally:
+            with condition:
+                state["active"] -= 1
+                if not state["active"]:
+                    state["idle_since"] = time.monotonic()
+                if size:
+                    self._record(state, size, started)
+                condition.notify_all()
 
     @staticmethod
-    def run_in_background(target_func, daemon=True, *args, **kwargs):
-        thread = threading.Thread(
-            target=target_func, args=args, kwargs=kwargs, daemon=daemon
+    def _get_busy_time(state):
+        # Must be called with the device condition held, while a job runs or has just finished
+        return time.monotonic() - state["idle_time"]
+
+    def _record(self, state, size, started):
+        # Must be called with the device condition held
+        # The window spans busy time since the earliest of its jobs started
+        if state["window_start"] is None or started < state["window_start"]:
+            state["window_start"] = started
+        state["window_bytes"] += size
+        state["window_jobs"] += 1
+        if state["window_jobs"] < max(state["limit"], 2):
+            return
+
+        elapsed = max(self._get_busy_time(state) - state["window_start"], 1e-6)
+        throughput = state["window_bytes"] / elapsed
+        last_throughput = state["last_throughput"]
+
+        if last_throughput is not None:
+            if throughput < last_throughput * (1 - self.TOLERANCE):
+                # Got worse, go back the other way
+                state["direction"] = -state["direction"]
+                state["limit"] += state["direction"]
+            elif throughput > last_throughput * (1 + self.TOLERANCE):
+                state["limit"] += state["direction"]
+        else:
+            state["limit"] += state["direction"]
+
+        state["limit"] = max(1, min(state["limit"], self.get_max_limit()))
+        log.debug(
+            f"Throughput {throughput / 2**20:.1f} MiB/s, concurrency limit is {state['limit']}"
         )
-        thread.start()
-        return thread
+
+        state["last_throughput"] = throughput
+        state["window_start"] = None
+        state["window_bytes"] = 0
+        state["window_jobs"] = 0
 
 
 class SubprocessManager:
@@ -126,6 +522,14 @@ class SubprocessManager:
             log.error(f"Timeout expired for {context}.")
             return False, "Timeout expired"
 
+        if result_container.get("cancelled"):
+            log.warning(f"Cancelled {context}.")
+            return False, "Cancelled"
+
+        if result_container.get("stalled"):
+            log.error(f"No activity for too long during {context}.")
+            return False, "Process stalled"
+
         if "exception" in result_container:
             log.exception(f"An error occurred during {context}.")
             return False, str(result_container["exception"])
@@ -138,19 +542,397 @@ class SubprocessManager:
         return True, result_container.get("stdout", "").strip()
 
     @staticmethod
-    def execute_subprocess(result_container, command, cwd=None, env=None):
+    def terminate_process_tree(pid, grace_period=3):
+        """
+        Terminate a process and its children by pid, blocks for up to `grace_period` seconds.
+        Returns False if only the process itself has to be killed by the caller.
+        """
         try:
-            process = subprocess.Popen(
+            import psutil
+
+            try:
+                parent = psutil.Process(pid)
+                processes = parent.children(recursive=True) + [parent]
+                for proc in processes:
+                    try:
+                        proc.terminate()
+                    except psutil.NoSuchProcess:
+                        continue
+                _, alive = psutil.wait_procs(processes, timeout=grace_period)
+                for proc in alive:
+                    try:
+                        proc.kill()
+                    except psutil.NoSuchProcess:
+                        continue
+            except psutil.NoSuchProcess:
+                pass
+            return True
+        except ImportError:
+            log.warning("psutil is not installed; killing process tree natively.")
+            try:
+                if sys.platform == "win32":
+                    subprocess.run(
+                        ["taskkill", "/F", "/T", "/PID", str(pid)],
+                        stdout=subprocess.PIPE,
+                        stderr=subprocess.PIPE,
+                    )
+                else:
+                    # Processes are started in their own session, so the group id is the pid
+                    os.killpg(pid, signal.SIGKILL)
+                return True
+            except ProcessLookupError:
+                return True
+            except Exception as e:
+                log.error(f"Failed to kill process {pid}: {e}")
+        except Exception as e:
+            log.error(f"Failed to kill process tree of {pid}: {e}")
+        return False
+
+
+class AsyncLoop:
+    """Event loop running on a background thread, shared by all asynchronous operations."""
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls, *args, **kwargs):
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = super().__new__(cls)
+                cls._instance.initialize()
+        return cls._instance
+
+    def initialize(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(
+            target=self._run_loop, name="AsyncLoop", daemon=True
+        )
+        self.thread.start()
+        atexit.register(self.stop)
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coroutine):
+        """Schedule a coroutine from any thread, returns a concurrent future."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def run(self, coroutine, timeout=None):
+        """Synchronous facade: run a coroutine on the loop and wait for its result."""
+        if threading.current_thread() is self.thread:
+            raise RuntimeError("Can't wait for a coroutine on the event loop thread")
+        future = self.submit(coroutine)
+        try:
+            return future.result(timeout=timeout)
+        except BaseException:
+            future.cancel()
+            raise
+
+    def iterate(self, async_iterable, batch_size=1024, max_batches=16):
+        """
+        Synchronous facade for async generators: yield their items in the calling thread.
+        Items are handed over in batches through a bounded queue, so a slow consumer
+        pauses the producer instead of buffering everything.
+        """
+        if threading.current_thread() is self.thread:
+            raise RuntimeError("Can't iterate a generator on the event loop thread")
+        batches = queue.Queue(maxsize=max_batches)
+        done = object()
+
+        async def produce():
+            loop = asyncio.get_running_loop()
+            batch = []
+            try:
+                async for item in async_iterable:
+                    batch.append(item)
+                    if len(batch) >= batch_size:
+                        # Blocking on a full queue mustn't stall the loop
+                        await loop.run_in_executor(None, batches.put, batch)
+                        batch = []
+                if batch:
+                    await loop.run_in_executor(None, batches.put, batch)
+            finally:
+                await loop.run_in_executor(None, batches.put, done)
+
+        future = self.submit(produce())
+        try:
+            while True:
+                batch = batches.get()
+                if batch is done:
+                    break
+                yield from batch
+            future.result()
+        finally:
+            if not future.done():
+                future.cancel()
+                # Unblock the producer waiting on a full queue
+                while not future.done():
+                    try:
+                        batches.get(timeout=0.1)
+                    except queue.Empty:
+                        pass
+
+    def stop(self):
+        if self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+class ProcessWatchdog:
+    """
+    Tells stalled processes from slow ones: a process is stalled when it produced
+    no output and its disk activity didn't change for `stall_timeout` seconds.
+    """
+
+    def __init__(self, pid, stall_timeout=None, probes=()):
+        self.stall_timeout = stall_timeout
+        self.probes = list(probes)
+        self.last_activity = time.monotonic()
+        self.last_values = None
+
+        try:
+            import psutil
+
+            process = psutil.Process(pid)
+
+            def disk_io():
+                io = process.io_counters()
+                return io.read_bytes + io.write_bytes
+
+            disk_io()  # Not available on every platform
+            self.probes.append(disk_io)
+        except ImportError:
+            pass
+        except Exception as e:
+            log.debug(f"Can't watch disk activity of process {pid}: {e}")
+
+    @property
+    def enabled(self):
+        # Without a way to see disk activity, silent but busy processes would look stalled
+        return self.stall_timeout is not None and bool(self.probes)
+
+    def touch(self):
+        self.last_activity = time.monotonic()
+
+    def _probe(self):
+        values = []
+        for probe in self.probes:
+            try:
+                values.append(probe())
+            except Exception:
+                values.append(None)
+        return values
+
+    def is_stalled(self):
+        if not self.enabled:
+            return False
+        values = self._probe()
+        if values != self.last_values:
+            self.last_values = values
+            self.touch()
+        return time.monotonic() - self.last_activity > self.stall_timeout
+
+
+class AsyncSubprocessManager:
+    @classmethod
+    async def run(
+        cls,
+        command,
+        timeout=None,
+        cwd=None,
+        env=None,
+        cancel_event=None,
+        poll_interval=0.5,
+        stall_timeout=None,
+        activity_probes=(),
+        on_started=None,
+    ):
+        """
+        Run a command and collect its stdout, stderr and return code into a result container,
+        checked with `SubprocessManager.handle_errors`. On timeout or when `cancel_event` is set
+        the whole process tree is killed, and the reason is stored under the "killed" key.
+        With `stall_timeout` the process is also killed as "stalled" when it shows no output
+        and no disk activity (psutil I/O counters or `activity_probes` values) for that long.
+        The process tree is also killed when the awaiting task is cancelled.
+        `on_started` is called with the pid of the process once it's created.
+        """
+        result_container = {}
+        try:
+            process = await cls._create_process(command, cwd, env)
+        except Exception as e:
+            result_container["exception"] = e
+            return result_container
+        if on_started is not None:
+            on_started(process.pid)
+
+        watchdog = ProcessWatchdog(process.pid, stall_timeout, activity_probes)
+        stdout_reader = asyncio.ensure_future(
+            cls._read_stream(process.stdout, watchdog)
+        )
+        stderr_reader = asyncio.ensure_future(
+            cls._read_stream(process.stderr, watchdog)
+        )
+        watcher = asyncio.ensure_future(
+            cls._watch(
+                process,
+                command,
+                result_container,
+                timeout,
+                cancel_event,
+                poll_interval,
+                watchdog,
+            )
+        )
+        try:
+            stdout, stderr = await asyncio.gather(stdout_reader, stderr_reader)
+            await process.wait()
+            result_container["stdout"] = stdout.decode("utf-8", errors="replace")
+            result_container["stderr"] = stderr.decode("utf-8", errors="replace")
+            result_container["returncode"] = process.returncode
+        except asyncio.CancelledError:
+            log.warning(f"Killing process {process.pid} (task cancelled)")
+            await asyncio.shield(cls.kill_process_tree(process))
+            raise
+        except Exception as e:
+            await cls.kill_process_tree(process)
+            result_container["exception"] = e
+        finally:
+            watcher.cancel()
+            stdout_reader.cancel()
+            stderr_reader.cancel()
+        return result_container
+
+    @classmethod
+    async def stream(
+        cls,
+        command,
+        result_container,
+        timeout=None,
+        cwd=None,
+        env=None,
+        cancel_event=None,
+        poll_interval=0.5,
+        stall_timeout=None,
+        activity_probes=(),
+    ):
+        """
+        Run a command and yield its stdout line by line as it's produced.
+        `result_container` is filled like the one returned by `run`, except for "stdout",
+        once the generator is exhausted; the process tree is killed if it's closed early.
+        """
+        try:
+            process = await cls._create_process(command, cwd, env)
+        except Exception as e:
+            result_container["exception"] = e
+            return
+
+        watchdog = ProcessWatchdog(process.pid, stall_timeout, activity_probes)
+        # stderr is drained concurrently so the process never blocks on a full pipe
+        stderr_reader = asyncio.ensure_future(
+            cls._read_stream(process.stderr, watchdog)
+        )
+        watcher = asyncio.ensure_future(
+            cls._watch(
+                process,
                 command,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                cwd=cwd,
-                env=env,
+                result_container,
+                timeout,
+                cancel_event,
+                poll_interval,
+                watchdog,
             )
-            stdout, stderr = process.communicate()
-            result_container["stdout"] = stdout
-            result_container["stderr"] = stderr
+        )
+        try:
+            while True:
+                line = await process.stdout.readline()
+                if not line:
+                    break
+                watchdog.touch()
+                yield line.decode("utf-8", errors="replace").rstrip("\r\n")
+
+            await process.wait()
+            stderr = await stderr_reader
+            result_container["stderr"] = stderr.decode("utf-8", errors="replace")
             result_container["returncode"] = process.returncode
         except Exception as e:
             result_container["exception"] = e
+        finally:
+            watcher.cancel()
+            if process.returncode is None:
+                log.warning(f"Killing process {process.pid} (stream closed)")
+                await asyncio.shield(cls.kill_process_tree(process))
+            stderr_reader.cancel()
+
+    @staticmethod
+    async def _create_process(command, cwd, env):
+        return await asyncio.create_subprocess_exec(
+            *map(str, command),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            cwd=cwd,
+            env=env,
+            start_new_session=sys.platform != "win32",
+        )
+
+    @staticmethod
+    async def _read_stream(stream, watchdog, chunk_size=64 * 1024):
+        """Read a pipe to the end, any output counts as activity."""
+        chunks = []
+        while True:
+            chunk = await stream.read(chunk_size)
+            if not chunk:
+                return b"".join(chunks)
+            watchdog.touch()
+            chunks.append(chunk)
+
+    @classmethod
+    async def _watch(
+        cls,
+        process,
+        command,
+        result_container,
+        timeout,
+        cancel_event,
+        poll_interval,
+        watchdog=None,
+    ):
+        """Kill the process tree once `timeout` expires, it stalls or `cancel_event` is set."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout if timeout else None
+        while process.returncode is None:
+            wait_time = poll_interval
+            if deadline is not None:
+                wait_time = max(0, min(wait_time, deadline - loop.time()))
+            await asyncio.sleep(wait_time)
+
+            reason = None
+            if cancel_event is not None and cancel_event.is_set():
+                reason = "cancelled"
+            elif deadline is not None and loop.time() >= deadline:
+                reason = "timeout"
+            elif watchdog is not None and watchdog.is_stalled():
+                reason = "stalled"
+            if reason and process.returncode is None:
+                log.warning(
+                    f"Killing process {process.pid} ({reason}): {' '.join(map(str, command))}"
+                )
+                result_container["killed"] = reason
+                result_container[reason] = True
+                await cls.kill_process_tree(process)
+                return
+
+    @staticmethod
+    async def kill_process_tree(process, grace_period=3):
+        if process.returncode is not None:
+            return
+        loop = asyncio.get_running_loop()
+        # Waiting for the tree to exit blocks, so it's done off the loop
+        terminated = await loop.run_in_executor(
+            None, SubprocessManager.terminate_process_tree, process.pid, grace_period
+        )
+        if not terminated and process.returncode is None:
+            process.kill()
+        try:
+            await asyncio.wait_for(process.wait(), timeout=grace_period)
+        except asyncio.TimeoutError:
+            process.kill()
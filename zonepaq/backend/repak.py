@@ -1,94 +1,195 @@
 import os
+import re
+import tempfile
+import threading
+from contextlib import contextmanager
 from pathlib import Path
 
+from backend.event_bus import TaskProgress
 from backend.logger import log
-from backend.parallel_orchestrator import SubprocessManager, ThreadManager
+from backend.pak_index_cache import PakIndexCache
+from backend.pak_reader import PakFile, PakReader, UnsupportedPakError
+from backend.parallel_orchestrator import (
+    AsyncLoop,
+    AsyncSubprocessManager,
+    ConcurrencyGovernor,
+    SubprocessManager,
+)
 from backend.utilities import Data, Files
 from config.settings_manager import settings
 
 
+class _WriteCounter:
+    """
+    Bytes written by an unpack, added up by the native extractor or taken from
+    the I/O counters of the repak process, so progress never has to walk the output.
+    """
+
+    def __init__(self):
+        self.written = 0
+        self.process = None
+
+    def add(self, size):
+        self.written += size
+
+    def watch(self, pid):
+        try:
+            import psutil
+
+            self.process = psutil.Process(pid)
+        except ImportError:
+            pass
+        except Exception as e:
+            log.debug(f"Can't watch writes of process {pid}: {e}")
+
+    def get(self):
+        if self.process is not None:
+            try:
+                io = self.process.io_counters()
+                # Bytes written by the process itself, not the ones flushed to the disk later
+                self.written = getattr(io, "write_chars", io.write_bytes)
+            except Exception:
+                # Not available on every platform, or the process has already exited
+                pass
+        return self.written
+
+
 class Repak:
     """Provides methods for listing, unpacking, and repacking files using the Repak CLI tool."""
 
+    # Hard timeouts: a fixed allowance in seconds plus the size over a pessimistic throughput
+    TIMEOUTS = {
+        # Only the index is read, but encrypted ones are decrypted first
+        "list": (30, 200 * 1024**2),
+        "unpack": (60, 10 * 1024**2),
+        "pack": (60, 10 * 1024**2),
+    }
+    # Seconds without output or disk activity after which repak is considered hung
+    STALL_TIMEOUT = 120
+    # Seconds between samples of bytes written, for progress of single operations
+    PROGRESS_INTERVAL = 1
+
     @classmethod
-    def get_list(cls, file):
+    def get_entries(cls, file):
+        """
+        List pak entries mapped to their size, hash and compression.
+        Hashes are only the ones stored in the index itself, reading them from entry records
+        would cost a seek per entry; contents of conflicting entries are hashed when needed.
+        Unchanged paks are served from the persistent index cache.
+        """
         log.debug(f"Attempting to list contents of the file: {file}")
 
-        repak_path = settings.TOOLS_PATHS["repak_cli"]
-        # if not Files.is_existing_file_type(repak_path, ".exe"):
-        #     raise FileNotFoundError(f"repak doesn't exist at {repak_path}")
-
-        # Prepare the command to list the file contents
-        command = [repak_path, "list", str(file)]
-
-        # Set the working directory to where repak.exe is located
-        working_dir = Path(repak_path).parent
-
-        # Update the PATH environment variable to include the working directory
-        env = os.environ.copy()
-        env["PATH"] = str(working_dir) + ";" + env["PATH"]
+        cache = PakIndexCache()
+        entries = cache.get(file)
+        if entries is not None:
+            log.debug(f"Using cached listing of {file}.")
+            return True, entries
 
-        # Use the threading method with subprocess execution
-        result_container = ThreadManager.run_in_thread_with_result(
-            SubprocessManager.execute_subprocess,
-            timeout=60,
-            command=command,
-            cwd=str(working_dir),  # Pass the working directory
-            env=env,
-        )
+        # Read the index directly when possible, it's much faster than spawning repak
+        try:
+            index = PakReader.read_index(file)
+            entries = {
+                path: {
+                    "size": entry.uncompressed_size,
+                    "hash": entry.hash,
+                    "compression": entry.compression,
+                }
+                for path, entry in index.entries.items()
+            }
+            cache.put(file, entries)
+            log.debug(f"Successfully listed contents of {file}.")
+            return True, entries
+        except UnsupportedPakError as e:
+            log.debug(f"Can't read {file} natively ({e}), falling back to repak.")
+        except OSError as e:
+            log.error(f"Failed to read {file}: {e}")
+            return False, str(e)
 
-        # Handle errors and log
+        # Entries are collected as repak prints them, without holding its whole output
+        result_container = {}
+        entries = {
+            # repak doesn't report sizes and hashes
+            path: {"size": None, "hash": None, "compression": None}
+            for path in cls.iter_list(file, result_container)
+        }
         success, message = SubprocessManager.handle_errors(
             result_container, context=f"listing contents of {file}"
         )
-
         if not success:
             return False, message
 
+        cache.put(file, entries)
         log.debug(f"Successfully listed contents of {file}.")
-        return True, message.splitlines()
+        return True, entries
 
     @classmethod
-    def unpack(cls, source, destination, aes_key=None, allowed_extensions=None):
+    def unpack(
+        cls,
+        source,
+        destination,
+        aes_key=None,
+        allowed_extensions=None,
+        cancel_token=None,
+    ):
         log.debug(
             f'Attempting to unpack: {str(source)}{" using key: " + aes_key if aes_key else ""}'
         )
+        if cls._is_cancelled(cancel_token):
+            return False, "Cancelled"
+        staging_folder = None
         try:
-            repak_path = settings.TOOLS_PATHS["repak_cli"]
-            # if not Files.is_existing_file_type(repak_path, ".exe"):
-            #     raise FileNotFoundError(f"repak doesn't exist at {repak_path}")
-
             source = Path(source)
             destination = Path(destination)
-            unpacked_folder = Path(source).with_suffix("")
-
-            log.debug(f"Deleting {unpacked_folder}...")
-            Files.delete_path(unpacked_folder)
-
-            command = [repak_path]
-            if aes_key:
-                command.extend(["-a", aes_key])
-            command.extend(["unpack", str(source)])
-
-            # Set the working directory to where repak.exe is located
-            working_dir = Path(repak_path).parent
-
-            # Update the PATH environment variable to include the working directory
-            env = os.environ.copy()
-            env["PATH"] = str(working_dir) + ";" + env["PATH"]
-
-            log.debug(f"Unpacking {str(source)}...")
-            result_container = ThreadManager.run_in_thread_with_result(
-                SubprocessManager.execute_subprocess,
-                timeout=1800,
-                command=command,
-                cwd=str(working_dir),  # Pass the working directory
-                env=env,  # Pass the updated environment
+            target_folder = destination / source.stem
+
+            # repak writes into a private folder next to the target, so the result is
+            # moved in place by a rename and concurrent unpacks never share a folder
+            Files.create_dir(destination)
+            staging_folder = Path(
+                tempfile.mkdtemp(
+                    prefix=f".{source.stem}.", suffix=".unpacking", dir=destination
+                )
             )
 
-            success, message = SubprocessManager.handle_errors(
-                result_container, context=f"unpacking {str(source)}"
-            )
+            # Entries of other types are never decompressed nor written
+            include = [f"**/*{extension}" for extension in allowed_extensions or []]
+
+            log.debug(f"Unpacking {str(source)} into {str(staging_folder)}...")
+            size = source.stat().st_size
+            index = cls._try_read_index(source, aes_key)
+            counter = _WriteCounter()
+            with ConcurrencyGovernor().slot(destination, size=size), TaskProgress(
+                "unpack",
+                subject=source.name,
+                bytes_total=cls._get_unpacked_size(index, allowed_extensions),
+            ) as task, cls._track_progress(task, counter.get):
+                # The index is already decrypted, entries themselves are rarely encrypted
+                if include and cls._unpack_filtered_natively(
+                    source,
+                    index,
+                    allowed_extensions,
+                    staging_folder,
+                    cancel_token,
+                    progress=counter.add,
+                ):
+                    success, message = True, None
+                else:
+                    success, message = AsyncLoop().run(
+                        cls.unpack_async(
+                            source,
+                            output=staging_folder,
+                            include=include,
+                            aes_key=aes_key,
+                            cancel_event=cancel_token,
+                            on_started=counter.watch,
+                        )
+                    )
+                if not success:
+                    task.fail(message)
+
+            if cls._is_cancelled(cancel_token):
+                log.info(f"Unpacking of {str(source)} was cancelled.")
+                return False, "Cancelled"
 
             if not success:
                 if (
@@ -109,6 +210,7 @@ class Repak:
                             destination,
                             aes_key=settings.AES_KEY,
                             allowed_extensions=allowed_extensions,
+                            cancel_token=cancel_token,
                         )
                 else:
                     log.error(f"Failed to unpack {str(source)}: {message}")
@@ -116,40 +218,221 @@ class Repak:
 
             log.debug(f"Successfully unpacked {str(source)}.")
 
-            if allowed_extensions:
-                log.debug(f"Cleaning unpacked folder...")
-                Files.delete_path(
-                    unpacked_folder, allowed_extensions=allowed_extensions
-                )
+            if not Files.replace_folder(staging_folder, target_folder):
+                raise RuntimeError(f"Can't move unpacked files to {str(target_folder)}")
+            staging_folder = None
+
+            log.debug(f"Successfully unpacked {str(source)} to {str(target_folder)}")
+            return True, str(target_folder)
+
+        except Exception as e:
+            log.exception(f"An error occurred while unpacking {str(source)}")
+            return False, str(e)
+        finally:
+            # Partial output of failed or cancelled unpacks
+            if staging_folder is not None and Files.is_existing_folder(staging_folder):
+                Files.delete_path(staging_folder)
+
+    @classmethod
+    def extract_entries(
+        cls, source, paths, destination, aes_key=None, cancel_token=None
+    ):
+        """
+        Extract only the listed internal paths of a pak into destination, keeping their relative paths.
+        """
+        log.debug(
+            f'Attempting to extract {len(paths)} entries from: {str(source)}{" using key: " + aes_key if aes_key else ""}'
+        )
+        try:
+            source = Path(source)
+            destination = Path(destination)
+            paths = [Path(path).as_posix() for path in paths]
+
+            Files.create_dir(destination)
+
+            index = cls._try_read_index(source, aes_key)
+            if index is not None and cls._extract_entries_natively(
+                source, paths, destination, index=index, cancel_token=cancel_token
+            ):
+                if cls._is_cancelled(cancel_token):
+                    return False, "Cancelled"
+                return True, str(destination)
+
+            for paths_chunk in cls._split_include_paths(paths):
+                if cls._is_cancelled(cancel_token):
+                    return False, "Cancelled"
+                with ConcurrencyGovernor().slot(source):
+                    success, message = AsyncLoop().run(
+                        cls.unpack_async(
+                            source,
+                            output=destination,
+                            include=[cls._escape_glob(path) for path in paths_chunk],
+                            aes_key=aes_key,
+                            context=f"extracting entries of {str(source)}",
+                            cancel_event=cancel_token,
+                        )
+                    )
+                if cls._is_cancelled(cancel_token):
+                    return False, "Cancelled"
+
+                if not success:
+                    if (
+                        not aes_key
+                        and "pak is encrypted but no key was provided" in message
+                    ):
+                        if not Data.is_valid_aes_key(settings.AES_KEY):
+                            log.warning(
+                                f"{str(source)} is encrypted, but no valid AES key is detected. Aborting."
+                            )
+                            return False, None
+                        log.debug(
+                            f"{str(source)} is encrypted, trying again with AES key..."
+                        )
+                        return cls.extract_entries(
+                            source,
+                            paths,
+                            destination,
+                            aes_key=settings.AES_KEY,
+                            cancel_token=cancel_token,
+                        )
+                    log.error(f"Failed to extract entries of {str(source)}: {message}")
+                    raise RuntimeError(f"Command failed with error:\n{message}")
 
-            target_folder = destination / unpacked_folder.name
+            missing = [path for path in paths if not (destination / path).is_file()]
+            if missing:
+                log.warning(
+                    f"{len(missing)} entries weren't found in {str(source)}: {', '.join(missing)}"
+                )
 
-            if unpacked_folder.resolve() != target_folder.resolve():
-                log.debug(f"Deleting {target_folder}...")
-                Files.delete_path(target_folder)
-                log.debug("Moving unpacked folder to destination...")
-                Files.move_path(unpacked_folder, target_folder)
             log.debug(
-                f"Successfully unpacked {str(source)} and moved to {str(target_folder)}"
+                f"Successfully extracted {len(paths) - len(missing)} entries of {str(source)} to {str(destination)}"
             )
-            return True, str(target_folder)
+            return True, str(destination)
 
         except Exception as e:
-            log.exception(f"An error occurred while unpacking {str(source)}")
+            log.exception(f"An error occurred while extracting {str(source)}")
+            return False, str(e)
+
+    @classmethod
+    def hash_entries(cls, source, paths):
+        """
+        Return SHA1 hashes of uncompressed data for the listed entries.
+        Entries are hashed straight from the pak when possible, otherwise they're extracted first.
+        """
+        paths = [Path(path).as_posix() for path in paths]
+        try:
+            with PakFile(source) as pak:
+                return True, {
+                    path: pak.hash_entry(path) for path in paths if path in pak.entries
+                }
+        except UnsupportedPakError as e:
+            log.debug(f"Can't hash entries of {source} natively ({e}), extracting.")
+        except OSError as e:
+            log.error(f"Failed to read {source}: {e}")
             return False, str(e)
 
+        with tempfile.TemporaryDirectory() as temp_dir:
+            success, result = cls.extract_entries(source, paths, temp_dir)
+            if not success:
+                return False, result
+            hashes = {}
+            for path in paths:
+                extracted_file = Path(temp_dir) / path
+                if extracted_file.is_file():
+                    hashes[path] = Files.get_file_hash(extracted_file)
+            return True, hashes
+
+    @classmethod
+    def _extract_entries_natively(
+        cls, source, paths, destination, index=None, cancel_token=None, progress=None
+    ):
+        """
+        Extract the listed entries without repak, False when the pak isn't supported.
+        A cancelled extraction stops between entries and still counts as handled.
+        `progress` is called with the size of every extracted entry.
+        """
+        try:
+            with PakFile(source, index) as pak:
+                missing = [path for path in paths if path not in pak.entries]
+                for path in paths:
+                    if cls._is_cancelled(cancel_token):
+                        log.info(f"Extraction from {str(source)} was cancelled.")
+                        return True
+                    if path in pak.entries:
+                        pak.extract(path, destination)
+                        if progress is not None:
+                            progress(pak.entries[path].uncompressed_size)
+        except UnsupportedPakError as e:
+            log.debug(
+                f"Can't extract from {source} natively ({e}), falling back to repak."
+            )
+            return False
+
+        if missing:
+            log.warning(
+                f"{len(missing)} entries weren't found in {str(source)}: {', '.join(missing)}"
+            )
+        log.debug(
+            f"Successfully extracted {len(paths) - len(missing)} entries of {str(source)} to {str(destination)}"
+        )
+        return True
+
+    @classmethod
+    def _unpack_filtered_natively(
+        cls,
+        source,
+        index,
+        allowed_extensions,
+        destination,
+        cancel_token=None,
+        progress=None,
+    ):
+        """Extract entries with allowed extensions without repak, unless they are encrypted."""
+        if index is None:
+            log.debug(f"Index of {source} is unknown, falling back to repak.")
+            return False
+
+        extensions = tuple(extension.lower() for extension in allowed_extensions)
+        paths = [path for path in index.entries if path.lower().endswith(extensions)]
+        return cls._extract_entries_natively(
+            source,
+            paths,
+            destination,
+            index=index,
+            cancel_token=cancel_token,
+            progress=progress,
+        )
+
+    @staticmethod
+    def _escape_glob(path):
+        # repak treats include values as glob patterns
+        return re.sub(r"([\[\]*?])", r"[\1]", path)
+
+    @staticmethod
+    def _split_include_paths(paths, max_length=8000):
+        # Keep every command well below the Windows command line length limit
+        chunk, chunk_length = [], 0
+        for path in paths:
+            if chunk and chunk_length + len(path) > max_length:
+                yield chunk
+                chunk, chunk_length = [], 0
+            chunk.append(path)
+            chunk_length += len(path) + len(" --include ")
+        if chunk:
+            yield chunk
+
     @classmethod
-    def repack(cls, source, destination=None, forced_destination=None):
+    def repack(
+        cls, source, destination=None, forced_destination=None, cancel_token=None
+    ):
         if not destination and not forced_destination:
             raise TypeError(
                 "repack() missing required arguments: either 'destination' or 'forced_destination'"
             )
         log.debug(f"Attempting to repack: {source}")
+        if cls._is_cancelled(cancel_token):
+            return False, "Cancelled"
         try:
-            repak_path = settings.TOOLS_PATHS["repak_cli"]
-            # if not Files.is_existing_file_type(repak_path, ".exe"):
-            #     raise FileNotFoundError(f"repak doesn't exist at {repak_path}")
-
             source = Path(source)
 
             if forced_destination:
@@ -161,35 +444,27 @@ class Repak:
                 log.debug(f"Removing existing packed file: {packed_file}")
                 Files.delete_path(packed_file)
 
-            command = [
-                repak_path,
-                "pack",
-                "--version",
-                "V11",
-                str(source),
-                str(packed_file),
-            ]
-
-            # Set the working directory to where repak.exe is located
-            working_dir = Path(repak_path).parent
-
-            # Update the PATH environment variable to include the working directory
-            env = os.environ.copy()
-            env["PATH"] = str(working_dir) + ";" + env["PATH"]
-
-            result_container = ThreadManager.run_in_thread_with_result(
-                SubprocessManager.execute_subprocess,
-                timeout=1800,
-                command=command,
-                cwd=str(working_dir),  # Pass the working directory
-                env=env,
-            )
-
-            success, message = SubprocessManager.handle_errors(
-                result_container, context=f"repacking {str(source)}"
-            )
+            size = Files.get_folder_size(source)
+            with ConcurrencyGovernor().slot(source, size=size), TaskProgress(
+                "repack", subject=source.name, bytes_total=size
+            ) as task, cls._track_progress(
+                task, lambda: cls._get_file_size(packed_file)
+            ):
+                success, message = AsyncLoop().run(
+                    cls.pack_async(
+                        source, packed_file, cancel_event=cancel_token, size=size
+                    )
+                )
+                if not success:
+                    task.fail(message)
 
             if not success:
+                # A killed repak leaves a truncated pak behind
+                if packed_file.is_file():
+                    Files.delete_path(packed_file)
+                if cls._is_cancelled(cancel_token):
+                    log.info(f"Repacking of {str(source)} was cancelled.")
+                    return False, "Cancelled"
                 log.error(f"Failed to repack {str(source)} to {str(packed_file)}")
                 raise RuntimeError(f"Command failed with error:\n{message}")
 
@@ -199,3 +474,193 @@ class Repak:
         except Exception as e:
             log.exception(f"An error occurred while repacking {str(source)}")
             return False, str(e)
+
+    @staticmethod
+    def _try_read_index(source, aes_key=None):
+        try:
+            return PakReader.read_index(source, aes_key=aes_key or settings.AES_KEY)
+        except UnsupportedPakError as e:
+            log.debug(f"Can't read index of {source} natively: {e}")
+            return None
+
+    @staticmethod
+    def _get_unpacked_size(index, allowed_extensions=None):
+        """Bytes written by unpacking entries with allowed extensions, None when the index is unknown."""
+        if index is None:
+            return None
+        extensions = tuple(extension.lower() for extension in allowed_extensions or [])
+        return sum(
+            entry.uncompressed_size
+            for path, entry in index.entries.items()
+            if not extensions or path.lower().endswith(extensions)
+        )
+
+    @classmethod
+    @contextmanager
+    def _track_progress(cls, task, probe):
+        """
+        Advance the task to the bytes reported by `probe` while the block runs,
+        repak itself doesn't report progress.
+        """
+        stop = threading.Event()
+
+        def sample():
+            while not stop.wait(cls.PROGRESS_INTERVAL):
+                try:
+                    written = probe()
+                except OSError:
+                    # Files are being moved or removed while they're counted
+                    continue
+                if written and written > task.bytes_done:
+                    task.advance(size=written - task.bytes_done)
+
+        thread = threading.Thread(target=sample, name="RepakProgress", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    @staticmethod
+    def _is_cancelled(cancel_token):
+        return cancel_token is not None and cancel_token.is_cancelled
+
+    @staticmethod
+    def _get_repak_environment():
+        repak_path = settings.TOOLS_PATHS["repak_cli"]
+        # if not Files.is_existing_file_type(repak_path, ".exe"):
+        #     raise FileNotFoundError(f"repak doesn't exist at {repak_path}")
+
+        # Set the working directory to where repak.exe is located
+        working_dir = Path(repak_path).parent
+
+        # Update the PATH environment variable to include the working directory
+        env = os.environ.copy()
+        env["PATH"] = str(working_dir) + ";" + env["PATH"]
+
+        return repak_path, str(working_dir), env
+
+    @classmethod
+    def _get_command(cls, args, aes_key=None):
+        repak_path, working_dir, env = cls._get_repak_environment()
+
+        command = [repak_path]
+        if aes_key:
+            command.extend(["-a", aes_key])
+        command.extend(args)
+        return command, working_dir, env
+
+    @classmethod
+    def _get_timeout(cls, operation, size):
+        allowance, throughput = cls.TIMEOUTS[operation]
+        return allowance + (size or 0) / throughput
+
+    @staticmethod
+    def _get_file_size(file):
+        try:
+            return Path(file).stat().st_size
+        except OSError:
+            return None
+
+    @classmethod
+    async def _run_async(
+        cls,
+        args,
+        timeout,
+        context,
+        aes_key=None,
+        cancel_event=None,
+        activity_probes=(),
+        on_started=None,
+    ):
+        command, working_dir, env = cls._get_command(args, aes_key)
+
+        # The process is killed if it outlives the timeout or stops making progress
+        result_container = await AsyncSubprocessManager.run(
+            command,
+            timeout=timeout,
+            cwd=working_dir,
+            env=env,
+            cancel_event=cancel_event,
+            stall_timeout=cls.STALL_TIMEOUT,
+            activity_probes=activity_probes,
+            on_started=on_started,
+        )
+        return SubprocessManager.handle_errors(result_container, context=context)
+
+    @classmethod
+    async def iter_list_async(
+        cls, file, result_container, aes_key=None, cancel_event=None
+    ):
+        """
+        Yield internal paths of a pak as repak prints them.
+        Check `result_container` with `SubprocessManager.handle_errors` once exhausted,
+        a failed listing may have yielded only part of the paths.
+        """
+        command, working_dir, env = cls._get_command(["list", str(file)], aes_key)
+        async for line in AsyncSubprocessManager.stream(
+            command,
+            result_container,
+            timeout=cls._get_timeout("list", cls._get_file_size(file)),
+            cwd=working_dir,
+            env=env,
+            cancel_event=cancel_event,
+            stall_timeout=cls.STALL_TIMEOUT,
+        ):
+            path = line.strip()
+            if path:
+                yield path
+
+    @classmethod
+    def iter_list(cls, file, result_container, aes_key=None, cancel_event=None):
+        """Synchronous counterpart of `iter_list_async`."""
+        return AsyncLoop().iterate(
+            cls.iter_list_async(
+                file, result_container, aes_key=aes_key, cancel_event=cancel_event
+            )
+        )
+
+    @classmethod
+    async def unpack_async(
+        cls,
+        source,
+        output=None,
+        include=None,
+        aes_key=None,
+        context=None,
+        cancel_event=None,
+        on_started=None,
+    ):
+        """
+        Unpack a pak with repak next to it, or into `output` overwriting existing files.
+        `include` limits unpacking to the listed glob patterns.
+        """
+        args = ["unpack", str(source)]
+        if output is not None:
+            args.extend(["--output", str(output), "--force"])
+        for pattern in include or []:
+            args.extend(["--include", pattern])
+
+        return await cls._run_async(
+            args,
+            timeout=cls._get_timeout("unpack", cls._get_file_size(source)),
+            context=context or f"unpacking {str(source)}",
+            aes_key=aes_key,
+            cancel_event=cancel_event,
+            on_started=on_started,
+        )
+
+    @classmethod
+    async def pack_async(cls, source, packed_file, cancel_event=None, size=None):
+        """Pack a folder of `size` bytes into a V11 pak with repak."""
+        if size is None:
+            size = Files.get_folder_size(source)
+        return await cls._run_async(
+            ["pack", "--version", "V11", str(source), str(packed_file)],
+            timeout=cls._get_timeout("pack", size),
+            context=f"repacking {str(source)}",
+            cancel_event=cancel_event,
+            # The pak grows while entries are written
+            activity_probes=[lambda: cls._get_file_size(packed_file)],
+        )
@@ -1,6 +1,6 @@
 import logging
+import os
 import re
-import shutil
 import subprocess
 import sys
 import tempfile
@@ -10,14 +10,19 @@ from concurrent.futures import as_completed
 from pathlib import Path
 
 import requests
+from backend.event_bus import TaskProgress
 from backend.logger import log
+from backend.pak_reader import PakReader, UnsupportedPakError
 from backend.parallel_orchestrator import (
+    CancellationToken,
+    ExecutorRegistry,
+    OperationCancelled,
     TaskRetryManager,
-    ThreadExecutor,
     ThreadManager,
 )
 from backend.repak import Repak
 from backend.utilities import Data, Files
+from backend.vanilla_manifest import VanillaManifest
 from config.settings_manager import settings
 from config.translations import translate
 from gui.window_messagebox import WindowMessageBox
@@ -30,6 +35,9 @@ class ToolsManager:
     _instance = None
     _lock = threading.Lock()
 
+    # Only these vanilla files are ever unpacked, the rest of the pak is skipped
+    VANILLA_EXTENSIONS = [".cfg", ".ini"]
+
     def __new__(cls, *args, **kwargs):
         with cls._lock:
             if cls._instance is None:
@@ -43,8 +51,17 @@ class ToolsManager:
 
         self.seven_zip_local_exe = settings.TOOLS["7zr"]["local_exe"]
 
+        # Tokens of vanilla files being unpacked in the background, by their index
+        self.vanilla_unpack_tokens = {}
+        # Tokens of tools being installed in the background, by their settings key
+        self.install_tokens = {}
+
     def install_repak_cli(
-        self, parent, install_metadata={"settings_key": "repak_cli"}, auto_mode=False
+        self,
+        parent,
+        install_metadata={"settings_key": "repak_cli"},
+        auto_mode=False,
+        cancel_token=None,
     ):
         install_metadata.update(settings.TOOLS["repak_cli"])
         return self._install_tool(
@@ -56,10 +73,15 @@ class ToolsManager:
             },
             install_metadata=install_metadata,
             auto_mode=auto_mode,
+            cancel_token=cancel_token,
         )
 
     def install_kdiff3(
-        self, parent, install_metadata={"settings_key": "kdiff3"}, auto_mode=False
+        self,
+        parent,
+        install_metadata={"settings_key": "kdiff3"},
+        auto_mode=False,
+        cancel_token=None,
     ):
         install_metadata.update(settings.TOOLS["kdiff3"])
         return self._install_tool(
@@ -68,10 +90,15 @@ class ToolsManager:
             download_args={"base_url": settings.TOOLS["kdiff3"]["base_url"]},
             install_metadata=install_metadata,
             auto_mode=auto_mode,
+            cancel_token=cancel_token,
         )
 
     def install_winmerge(
-        self, parent, install_metadata={"settings_key": "winmerge"}, auto_mode=False
+        self,
+        parent,
+        install_metadata={"settings_key": "winmerge"},
+        auto_mode=False,
+        cancel_token=None,
     ):
         install_metadata.update(settings.TOOLS["winmerge"])
         return self._install_tool(
@@ -83,11 +110,76 @@ class ToolsManager:
             },
             install_metadata=install_metadata,
             auto_mode=auto_mode,
+            cancel_token=cancel_token,
         )
 
-    def unpack_vanilla_files_in_background(self, *args, **kwargs):
+    def cancel_background_tasks(self):
+        """Cancel all installs and vanilla unpacks running in the background."""
+        for cancel_token in [
+            *self.install_tokens.values(),
+            *self.vanilla_unpack_tokens.values(),
+        ]:
+            cancel_token.cancel()
+
+    def install_tool_in_background(
+        self, parent, install_method, install_metadata={}, **kwargs
+    ):
+        """
+        Start installing in a background thread.
+        When the same tool is still being installed, offer to cancel its download instead.
+        """
+        settings_key = install_metadata.get("settings_key")
+        running_token = self.install_tokens.get(settings_key)
+        if running_token is not None:
+            if WindowMessageBox.askyesno(
+                parent, message=translate("settings_tools_install_cancel")
+            ):
+                running_token.cancel()
+            return
+
+        cancel_token = CancellationToken()
+        self.install_tokens[settings_key] = cancel_token
+
         def background_task():
-            self.unpack_vanilla_files(*args, **kwargs)
+            try:
+                install_method(
+                    parent,
+                    install_metadata=install_metadata,
+                    cancel_token=cancel_token,
+                    **kwargs,
+                )
+            finally:
+                self.install_tokens.pop(settings_key, None)
+
+        ThreadManager.run_in_background(background_task)
+
+    def unpack_vanilla_files_in_background(self, parent, install_metadata={}, **kwargs):
+        """
+        Start unpacking in a background thread.
+        When the same vanilla file is still being unpacked, offer to cancel it instead.
+        """
+        index = install_metadata.get("index")
+        running_token = self.vanilla_unpack_tokens.get(index)
+        if running_token is not None:
+            if WindowMessageBox.askyesno(
+                parent, message=translate("settings_tools_unpack_cancel")
+            ):
+                running_token.cancel()
+            return
+
+        cancel_token = CancellationToken()
+        self.vanilla_unpack_tokens[index] = cancel_token
+
+        def background_task():
+            try:
+                self.unpack_vanilla_files(
+                    parent,
+                    install_metadata=install_metadata,
+                    cancel_token=cancel_token,
+                    **kwargs,
+                )
+            finally:
+                self.vanilla_unpack_tokens.pop(index, None)
 
         ThreadManager.run_in_background(background_task)
 
@@ -97,6 +189,7 @@ class ToolsManager:
         install_metadata={},
         auto_mode=False,
         skip_aes_dumpster_download=False,
+        cancel_token=None,
     ):
         aes_key = install_metadata.get("aes_key")
 
@@ -122,56 +215,37 @@ class ToolsManager:
         item = games_manager.vanilla_files[file_index]
         vanilla_file = Path(item["archive"])
         unpacked_folder = Path(item["unpacked"])
-        unpacked_folder_parent = unpacked_folder.parent
 
         results_ok = []
         results_ko = []
-        link_path = None
-        actual_link_path = None
-
-        # Skip unpacking if unpacked_folder isn't empty
-        if not Files.is_folder_empty(unpacked_folder):
-            results_ko.append(
-                f'{str(unpacked_folder)} ({translate("generic_folder_is_not_empty")})'
-            )
-        elif Files.is_existing_file(vanilla_file):
-            link_path = unpacked_folder_parent / vanilla_file.name
 
-            # Create the symbolic link
-            actual_link_path = Path(Files.link_path(vanilla_file, link_path))
+        if Files.is_existing_file(vanilla_file):
+            task_retry_manager = TaskRetryManager(ExecutorRegistry().get("subprocess"))
 
-            task_retry_manager = TaskRetryManager(ThreadExecutor())
-
-            # Unpack the vanilla files
-            log.info("Unpacking vanilla file to destination, it may take long time...")
+            # Already unpacked folders are refreshed, only changed entries are extracted
+            log.info("Unpacking vanilla configs to destination...")
             results_ok_partial, results_ko_partial = (
                 task_retry_manager.execute_tasks_with_retries(
-                    [actual_link_path],
-                    lambda f: Repak.unpack(
+                    [vanilla_file],
+                    lambda f: self._unpack_vanilla(
                         f,
-                        unpacked_folder_parent,
+                        unpacked_folder,
                         aes_key=aes_key,
-                        allowed_extensions=[".cfg", ".ini"],
+                        cancel_token=cancel_token,
                     ),
+                    task_name="unpack",
+                    cancel_token=cancel_token,
                 )
             )
 
-            results_ok.extend([f"{str(vanilla_file)} -> {unpacked_folder}"])
+            for summary in results_ok_partial.values():
+                result = f"{str(vanilla_file)} -> {unpacked_folder}"
+                results_ok.append(f"{result} ({summary})" if summary else result)
             results_ko.extend(
                 f"{str(vanilla_file)}: {result}"
                 for result in results_ko_partial.values()
             )
 
-        # Cleanup temporary folder if created
-        if actual_link_path and actual_link_path.resolve() != link_path.resolve():
-            temp_folder = actual_link_path.parent
-            if Files.is_existing_folder(temp_folder):
-                Files.delete_path(temp_folder)
-
-        # Delete link
-        if link_path and Files.is_existing_file(link_path):
-            Files.delete_path(link_path)
-
         if not auto_mode:
             self.show_results(
                 parent,
@@ -183,6 +257,135 @@ class ToolsManager:
 
         return bool(results_ok) and not bool(results_ko)
 
+    def _unpack_vanilla(
+        self, vanilla_file, unpacked_folder, aes_key=None, cancel_token=None
+    ):
+        """
+        Unpack configs of a vanilla pak, or bring the already unpacked folder up to date
+        after a game patch. Returns (success, summary of changes or error message).
+        """
+        manifest = VanillaManifest.load(unpacked_folder)
+        if manifest and manifest.is_up_to_date(vanilla_file):
+            log.info(f"{str(unpacked_folder)} is up to date with {str(vanilla_file)}.")
+            return True, translate("generic_up_to_date")
+
+        entries = self._read_vanilla_entries(vanilla_file, aes_key)
+        if entries is not None and manifest and manifest.entries is not None:
+            return self._refresh_vanilla(
+                vanilla_file, unpacked_folder, manifest, entries, aes_key, cancel_token
+            )
+
+        # Without hashes of both sides there's nothing to compare, the folder is replaced
+        success, result = Repak.unpack(
+            vanilla_file,
+            unpacked_folder.parent,
+            aes_key=aes_key,
+            allowed_extensions=self.VANILLA_EXTENSIONS,
+            cancel_token=cancel_token,
+        )
+        if not success:
+            return False, result
+        VanillaManifest.for_archive(unpacked_folder, vanilla_file, entries).save()
+        return True, None
+
+    def _read_vanilla_entries(self, vanilla_file, aes_key=None):
+        """Map unpackable entries of a vanilla pak to their index hashes, None if the index can't be read."""
+        try:
+            index = PakReader.read_index(
+                vanilla_file,
+                with_hashes=True,
+                aes_key=aes_key or settings.AES_KEY,
+                extensions=self.VANILLA_EXTENSIONS,
+            )
+        except UnsupportedPakError as e:
+            log.debug(f"Can't read index of {str(vanilla_file)} natively: {e}")
+            return None
+
+        return {path: entry.hash for path, entry in index.entries.items()}
+
+    def _refresh_vanilla(
+        self, vanilla_file, unpacked_folder, manifest, entries, aes_key, cancel_token
+    ):
+        added, changed, removed = manifest.diff(entries)
+        log.info(
+            f"Refreshing {str(unpacked_folder)}: {len(added)} added, {len(changed)} changed, {len(removed)} removed entries."
+        )
+
+        updated = added + changed
+        refreshed = dict(manifest.entries)
+        complete = True
+        staging_folder = None
+        try:
+            if updated:
+                # Entries are extracted aside on the same volume and renamed in place one by one
+                staging_folder = Path(
+                    tempfile.mkdtemp(
+                        prefix=f".{unpacked_folder.name}.",
+                        suffix=".refreshing",
+                        dir=unpacked_folder.parent,
+                    )
+                )
+                success, result = Repak.extract_entries(
+                    vanilla_file,
+                    updated,
+                    staging_folder,
+                    aes_key=aes_key,
+                    cancel_token=cancel_token,
+                )
+                if not success:
+                    return False, result
+            if cancel_token is not None and cancel_token.is_cancelled:
+                return False, "Cancelled"
+
+            with TaskProgress(
+                "unpack", subject=vanilla_file.name, total=len(updated) + len(removed)
+            ) as task:
+                for path in updated:
+                    staged_file = staging_folder / path
+                    if staged_file.is_file():
+                        target_file = unpacked_folder / path
+                        Files.create_dir(target_file.parent)
+                        os.replace(staged_file, target_file)
+                        refreshed[path] = entries[path]
+                    else:
+                        # Retried on the next refresh
+                        complete = False
+                    task.advance(1)
+
+                for path in removed:
+                    self._delete_unpacked_entry(unpacked_folder, path)
+                    refreshed.pop(path, None)
+                    task.advance(1)
+
+            VanillaManifest.for_archive(
+                unpacked_folder, vanilla_file, refreshed, complete
+            ).save()
+        finally:
+            if staging_folder is not None and Files.is_existing_folder(staging_folder):
+                Files.delete_path(staging_folder)
+
+        return True, ", ".join(
+            [
+                f'{translate("generic_added")}: {len(added)}',
+                f'{translate("generic_changed")}: {len(changed)}',
+                f'{translate("generic_removed")}: {len(removed)}',
+            ]
+        )
+
+    @staticmethod
+    def _delete_unpacked_entry(unpacked_folder, path):
+        target_file = unpacked_folder / path
+        if target_file.is_file():
+            Files.delete_path(target_file)
+
+        # Folders left empty by the removal go as well
+        folder = target_file.parent
+        while (
+            folder != unpacked_folder and folder.is_dir() and not any(folder.iterdir())
+        ):
+            folder.rmdir()
+            folder = folder.parent
+
     @staticmethod
     def show_results(
         parent,
@@ -288,7 +491,11 @@ class ToolsManager:
             return False
 
     def install_aes_dumpster(
-        self, parent, install_metadata={"settings_key": "aes_dumpster"}, auto_mode=False
+        self,
+        parent,
+        install_metadata={"settings_key": "aes_dumpster"},
+        auto_mode=False,
+        cancel_token=None,
     ):
         install_metadata.update(settings.TOOLS["aes_dumpster"])
         return self._install_tool(
@@ -301,6 +508,7 @@ class ToolsManager:
             install_metadata=install_metadata,
             skip_extract=True,
             auto_mode=auto_mode,
+            cancel_token=cancel_token,
         )
 
     def _install_tool(
@@ -313,6 +521,7 @@ class ToolsManager:
         auto_mode=False,
         check_platform=True,
         skip_search=False,
+        cancel_token=None,
     ):
         # Check platform compatibility
         if check_platform and not sys.platform.startswith("win"):
@@ -372,10 +581,12 @@ class ToolsManager:
                 skip_extract=skip_extract,
                 extract_parameter=extract_parameter,
                 auto_mode=auto_mode,
+                cancel_token=cancel_token,
             )
 
             if not install_result:
-                if not auto_mode:
+                cancelled = cancel_token is not None and cancel_token.is_cancelled
+                if not auto_mode and not cancelled:
                     WindowMessageBox.showerror(
                         parent,
                         message=f'{translate("dialogue_install_error")} {display_name}\n{translate("dialogue_check_logs")}',
@@ -427,6 +638,7 @@ class ToolsManager:
         skip_extract,
         extract_parameter,
         auto_mode=False,
+        cancel_token=None,
     ):
 
         output_dir = Path(local_exe).parent
@@ -449,7 +661,7 @@ class ToolsManager:
         # Download installer
         log.info(f"Downloading {display_name}...")
         downloaded_file = self.check_and_download_installer(
-            parent, url, installer_path, display_name, auto_mode
+            parent, url, installer_path, display_name, auto_mode, cancel_token
         )
 
         if not downloaded_file:
@@ -537,7 +749,7 @@ class ToolsManager:
             return None
 
     def check_and_download_installer(
-        self, parent, url, target_file, display_name, auto_mode
+        self, parent, url, target_file, display_name, auto_mode, cancel_token=None
     ):
         # Check if the installer needs to be confirmed and prepared
         if target_file.exists():
@@ -558,7 +770,9 @@ class ToolsManager:
         Files.delete_path(target_file)
 
         # Download the file
-        downloaded_file = self.download_file(url, target_file)
+        downloaded_file = self.download_file(
+            url, target_file, cancel_token=cancel_token
+        )
 
         return downloaded_file
 
@@ -578,7 +792,8 @@ class ToolsManager:
     #         log.exception(f"Download failed: {e}")
     #         return False
 
-    def download_file(self, url, target_file, timeout=30):
+    def download_file(self, url, target_file, timeout=30, cancel_token=None):
+        temp_file = None
         try:
             target_file = Path(target_file)
             Files.create_dir(target_file.parent)
@@ -592,19 +807,35 @@ class ToolsManager:
                     log.warning(f"Unexpected content type: {content_type}")
                     return False
 
+                content_length = response.headers.get("Content-Length")
                 temp_file = target_file.with_suffix(".tmp")
-                with open(temp_file, "wb") as f:
-                    shutil.copyfileobj(response.raw, f, length=1024 * 1024)
+                with open(temp_file, "wb") as f, TaskProgress(
+                    "download",
+                    subject=target_file.name,
+                    bytes_total=int(content_length) if content_length else None,
+                ) as task:
+                    for chunk in iter(lambda: response.raw.read(1024 * 1024), b""):
+                        if cancel_token is not None:
+                            cancel_token.raise_if_cancelled()
+                        f.write(chunk)
+                        task.advance(size=len(chunk))
                 temp_file.rename(target_file)
+                temp_file = None
 
             log.debug(f"Successfully downloaded to {target_file}")
             return True
+        except OperationCancelled:
+            log.info(f"Download cancelled: {url}")
         except requests.Timeout:
             log.error(f"Download timed out: {url}")
         except requests.RequestException as e:
             log.exception(f"Download failed: {e}")
         except Exception as e:
             log.exception(f"Unexpected error: {e}")
+        finally:
+            # Don't leave partial downloads behind
+            if temp_file is not None and Files.is_existing_file(temp_file):
+                Files.delete_path(temp_file)
         return False
 
     def extract_installer(self, installer_path, output_dir, extract_parameter=""):
@@ -304,6 +304,35 @@ class Files:
             log.exception(f"Unexpected error during move operation: {e}")
             return False
 
+    @classmethod
+    def replace_folder(cls, src, dest):
+        """
+        Put a folder in place of another one on the same volume by renaming,
+        the previous folder is renamed aside first and deleted afterwards.
+        """
+        src = Path(src).absolute()
+        dest = Path(dest).absolute()
+        previous = None
+        try:
+            if dest.exists():
+                # Directories can't be replaced in one rename on Windows
+                previous = dest.with_name(
+                    f".{dest.name}.{os.getpid()}.{time.time_ns()}.old"
+                )
+                os.replace(dest, previous)
+            os.replace(src, dest)
+            log.debug(f"Replaced {dest} with {src}")
+        except OSError as e:
+            log.error(f"Failed to replace {dest} with {src}: {e}")
+            if previous is not None and not dest.exists():
+                os.replace(previous, dest)
+                previous = None
+            return False
+        finally:
+            if previous is not None:
+                cls.delete_path(previous)
+        return True
+
     # !WORKAROUND for shutil.rmtree hanging up in some cases
     @classmethod
     def delete_path(cls, path, retries=3, delay=1, timeout=10, allowed_extensions=None):
@@ -534,6 +563,24 @@ class Files:
 
         return base_delay * (2 ** (attempt - 1)) + random.uniform(0, 0.5)
 
+    @staticmethod
+    def get_folder_size(folder_path):
+        return sum(
+            file.stat().st_size
+            for file in Path(folder_path).rglob("*")
+            if file.is_file()
+        )
+
+    @staticmethod
+    def get_file_hash(file_path, algorithm="sha1", chunk_size=1024 * 1024):
+        import hashlib
+
+        hasher = hashlib.new(algorithm)
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                hasher.update(chunk)
+        return hasher.hexdigest()
+
     @staticmethod
     def get_relative_path(path):
         absolute_path = Path(path).absolute()
@@ -645,42 +692,25 @@ class Data:
             log.exception(f"Error during AES validation of {key}: {e}")
             return False
 
-    # @staticmethod
-    # def build_content_tree(gathered_files: dict) -> dict:
-    #     content_tree = {}
-    #     for source_path, file_paths in gathered_files.items():
-    #         for file_path in file_paths:
-    #             parts = Path(file_path).parts
-    #             game_name, *file_hierarchy, file_name = parts
-
-    #             current_level = content_tree.setdefault(game_name, {})
-    #             for part in file_hierarchy:
-    #                 current_level = current_level.setdefault(part, {})
-
-    #             current_level.setdefault(file_name, []).append(source_path)
-
-    #     return content_tree
-
     @staticmethod
-    def build_content_tree(gathered_files: dict) -> dict:
-        content_tree = {}
-        for source_path, file_paths in gathered_files.items():
-            for file_path in file_paths:
-                parts = Path(file_path).parts
-
-                if len(parts) == 1:
-                    # Top-level file, directly add it to the content tree
-                    file_name = parts[0]
-                    current_level = content_tree.setdefault(file_name, [])
-                    current_level.append(source_path)
-                else:
-                    # Unpack parts into game_name, hierarchy, and file_name
-                    game_name, *file_hierarchy, file_name = parts
+    def add_to_content_tree(content_tree: dict, source_path, file_paths) -> dict:
+        """Add paths of one source to the tree, `file_paths` can be any iterable, e.g. a stream."""
+        for file_path in file_paths:
+            parts = Path(file_path).parts
+
+            if len(parts) == 1:
+                # Top-level file, directly add it to the content tree
+                file_name = parts[0]
+                current_level = content_tree.setdefault(file_name, [])
+                current_level.append(source_path)
+            else:
+                # Unpack parts into game_name, hierarchy, and file_name
+                game_name, *file_hierarchy, file_name = parts
 
-                    current_level = content_tree.setdefault(game_name, {})
-                    for part in file_hierarchy:
-                        current_level = current_level.setdefault(part, {})
+                current_level = content_tree.setdefault(game_name, {})
+                for part in file_hierarchy:
+                    current_level = current_level.setdefault(part, {})
 
-                    current_level.setdefault(file_name, []).append(source_path)
+                current_level.setdefault(file_name, []).append(source_path)
 
         return content_tree
@@ -0,0 +1,211 @@
+import json
+import os
+import threading
+from pathlib import Path
+
+from backend.logger import log
+from backend.utilities import Files
+from backend.vanilla_manifest import VanillaManifest
+from config.settings_manager import settings
+
+
+class VanillaIndex:
+    """
+    Persistent index of the files in unpacked vanilla folders, keyed by their relative paths.
+    Paths of a folder are taken from its manifest, or from the folder itself when it was
+    unpacked without one, and are only collected again after the manifest changes.
+    Content hashes are computed on demand and kept while the manifest hash of the entry stays the same.
+    """
+
+    _instance = None
+    _lock = threading.Lock()
+
+    VERSION = 2
+
+    def __new__(cls, *args, **kwargs):
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = super().__new__(cls)
+                cls._instance.initialize()
+        return cls._instance
+
+    def initialize(self):
+        self.cache_file = Path(settings.CACHE["vanilla_index"]["file"])
+
+        self.lock = threading.Lock()
+        self.records = {}  # by unpacked folder
+        self.folders = []
+        # Paths are matched case-insensitively, the same way Windows resolves them
+        self.paths = {}  # (folder, relative path) pairs by the casefolded path
+
+        self.load()
+
+    @staticmethod
+    def _make_key(path):
+        return Path(path).as_posix().casefold()
+
+    @staticmethod
+    def _get_fingerprint(folder):
+        try:
+            stat = (Path(folder) / VanillaManifest.FILE_NAME).stat()
+            return [stat.st_size, stat.st_mtime_ns]
+        except OSError:
+            pass
+        # Folders unpacked by older versions have no manifest
+        return "unindexed" if Path(folder).is_dir() else None
+
+    def load(self):
+        with self.lock:
+            self.records.clear()
+            if not self.cache_file.is_file():
+                return
+            try:
+                with self.cache_file.open("r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("version") != self.VERSION:
+                    log.debug("Vanilla index version changed, starting over.")
+                    return
+                for record in data.get("folders", []):
+                    self.records[record["folder"]] = record
+                log.debug(f"Loaded vanilla index of {len(self.records)} folders.")
+            except Exception as e:
+                log.warning(f"Vanilla index is unreadable, starting over: {e}")
+                self.records.clear()
+
+    def _save(self):
+        # Must be called with self.lock held
+        try:
+            Files.create_dir(self.cache_file.parent)
+            temp_file = self.cache_file.with_suffix(".tmp")
+            with temp_file.open("w", encoding="utf-8") as f:
+                json.dump(
+                    {"version": self.VERSION, "folders": list(self.records.values())},
+                    f,
+                    ensure_ascii=False,
+                    separators=(",", ":"),
+                )
+            os.replace(temp_file, self.cache_file)
+            log.debug(f"Saved vanilla index of {len(self.records)} folders.")
+        except Exception as e:
+            log.error(f"Failed to save vanilla index: {e}")
+
+    def refresh(self, folders):
+        """
+        Bring the index up to date with the unpacked folders, listed by priority.
+        Costs a single stat per folder when none of them changed.
+        """
+        folders = [str(Path(folder)) for folder in folders]
+        with self.lock:
+            changed = folders != self.folders
+            updated = False
+            for folder in folders:
+                fingerprint = self._get_fingerprint(folder)
+                record = self.records.get(folder)
+                if record is None or record["fingerprint"] != fingerprint:
+                    entries = self._collect_entries(folder, fingerprint)
+                    self.records[folder] = {
+                        "folder": folder,
+                        "fingerprint": fingerprint,
+                        "entries": entries,
+                        "hashes": self._keep_hashes(record, entries),
+                    }
+                    changed = updated = True
+
+            if updated:
+                self._save()
+            if changed:
+                self._rebuild(folders)
+
+    def _collect_entries(self, folder, fingerprint):
+        """Map relative paths of the folder to their manifest hashes, None when unknown."""
+        if fingerprint is None:
+            return {}
+
+        manifest = VanillaManifest.load(folder)
+        if manifest and manifest.entries is not None:
+            entries = dict(manifest.entries)
+        else:
+            entries = {}
+            for root, _, file_names in os.walk(folder):
+                for file_name in file_names:
+                    path = Path(root, file_name).relative_to(folder).as_posix()
+                    entries[path] = None
+            entries.pop(VanillaManifest.FILE_NAME, None)
+
+        log.debug(f"Indexed {len(entries)} vanilla files in {folder}.")
+        return entries
+
+    @staticmethod
+    def _keep_hashes(record, entries):
+        # Without manifest hashes there's no telling whether a file was replaced
+        if record is None:
+            return {}
+        previous = record["entries"]
+        return {
+            path: content
+            for path, content in record["hashes"].items()
+            if entries.get(path) is not None and previous.get(path) == entries[path]
+        }
+
+    def _rebuild(self, folders):
+        # Must be called with self.lock held
+        paths = {}
+        for folder in folders:
+            for path in self.records[folder]["entries"]:
+                paths.setdefault(self._make_key(path), []).append((folder, path))
+        self.folders = folders
+        self.paths = paths
+
+    def contains(self, path):
+        return self._make_key(path) in self.paths
+
+    def find(self, path):
+        """Return vanilla files matching the relative path, the most relevant first."""
+        return [
+            Path(folder) / relative_path
+            for folder, relative_path in self.paths.get(self._make_key(path), ())
+        ]
+
+    def get_hashes(self, paths):
+        """
+        Return (size, SHA1) of the most relevant vanilla file for each of the relative paths.
+        Files are hashed only once, paths without a vanilla file are left out.
+        """
+        hashes = {}
+        missing = {}
+        with self.lock:
+            for path in paths:
+                matches = self.paths.get(self._make_key(path))
+                if not matches:
+                    continue
+                folder, relative_path = matches[0]
+                record = self.records[folder]
+                content = record["hashes"].get(relative_path)
+                if content:
+                    hashes[path] = tuple(content)
+                else:
+                    missing[path] = (record, relative_path)
+
+        if not missing:
+            return hashes
+
+        # Hashing is done without holding the lock, lookups shouldn't wait for it
+        computed = {}
+        for path, (record, relative_path) in missing.items():
+            vanilla_file = Path(record["folder"]) / relative_path
+            try:
+                size = vanilla_file.stat().st_size
+                computed[path] = (size, Files.get_file_hash(vanilla_file))
+            except OSError as e:
+                log.warning(f"Can't hash vanilla file {str(vanilla_file)}: {e}")
+        log.debug(f"Hashed {len(computed)} vanilla files.")
+
+        with self.lock:
+            for path, content in computed.items():
+                record, relative_path = missing[path]
+                # The folder could've been indexed anew in the meantime
+                if self.records.get(record["folder"]) is record:
+                    record["hashes"][relative_path] = list(content)
+            self._save()
+        hashes.update(computed)
+        return hashes
@@ -0,0 +1,110 @@
+import json
+import os
+from pathlib import Path
+
+from backend.logger import log
+
+
+class VanillaManifest:
+    """
+    Record of the vanilla pak entries unpacked into a folder, stored inside it.
+    Entries map internal paths to their index hashes, None when the index couldn't be read.
+    An incomplete manifest lacks some entries, so the folder needs refreshing even if the pak didn't change.
+    """
+
+    FILE_NAME = ".zonepaq_manifest.json"
+    VERSION = 1
+
+    def __init__(self, folder, archive, size, mtime_ns, entries=None, complete=True):
+        self.folder = Path(folder)
+        self.archive = str(archive)
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.entries = entries
+        self.complete = complete
+
+    @classmethod
+    def for_archive(cls, folder, archive, entries=None, complete=True):
+        stat = Path(archive).stat()
+        return cls(folder, archive, stat.st_size, stat.st_mtime_ns, entries, complete)
+
+    @classmethod
+    def load(cls, folder):
+        """Return the manifest of an unpacked folder or None when it's missing or unreadable."""
+        manifest_file = Path(folder) / cls.FILE_NAME
+        if not manifest_file.is_file():
+            return None
+        try:
+            with manifest_file.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != cls.VERSION:
+                log.debug(f"Manifest of {folder} has another version, ignoring it.")
+                return None
+            return cls(
+                folder,
+                data["archive"],
+                data["size"],
+                data["mtime_ns"],
+                data["entries"],
+                data["complete"],
+            )
+        except Exception as e:
+            log.warning(f"Manifest of {folder} is unreadable, ignoring it: {e}")
+            return None
+
+    def save(self):
+        manifest_file = self.folder / self.FILE_NAME
+        try:
+            temp_file = manifest_file.with_suffix(".tmp")
+            with temp_file.open("w", encoding="utf-8") as f:
+                json.dump(
+                    {
+                        "version": self.VERSION,
+                        "archive": self.archive,
+                        "size": self.size,
+                        "mtime_ns": self.mtime_ns,
+                        "entries": self.entries,
+                        "complete": self.complete,
+                    },
+                    f,
+                    ensure_ascii=False,
+                    separators=(",", ":"),
+                )
+            os.replace(temp_file, manifest_file)
+            log.debug(f"Saved manifest of {self.folder}.")
+            return True
+        except Exception as e:
+            log.error(f"Failed to save manifest of {self.folder}: {e}")
+            return False
+
+    def is_up_to_date(self, archive):
+        """True when the archive is the same file the folder was unpacked from."""
+        try:
+            stat = Path(archive).stat()
+        except OSError:
+            return False
+        return (
+            self.complete
+            and self.archive == str(archive)
+            and self.size == stat.st_size
+            and self.mtime_ns == stat.st_mtime_ns
+        )
+
+    def diff(self, entries):
+        """
+        Compare the current pak entries with the unpacked ones.
+        Returns (added, changed, removed) lists of internal paths.
+        """
+        previous = self.entries or {}
+        added, changed = [], []
+        for path, entry_hash in entries.items():
+            if path not in previous:
+                added.append(path)
+            elif (
+                entry_hash is None
+                or previous[path] != entry_hash
+                or not (self.folder / path).is_file()
+            ):
+                changed.append(path)
+        removed = [path for path in previous if path not in entries]
+        return added, changed, removed
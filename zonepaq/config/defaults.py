@@ -47,9 +47,32 @@ TOOLS = {
     },
 }
 
+CACHE = {
+    "cache_base": Path("zonepaq/cache"),
+    "pak_index": {
+        "file": Path("zonepaq/cache/pak_index.json"),
+        "max_paks": 1000,
+        "max_entries": 200000,
+    },
+    "vanilla_index": {
+        "file": Path("zonepaq/cache/vanilla_index.json"),
+    },
+}
+
 SUPPORTED_MERGING_ENGINES = {
     "kdiff3": {"name": TOOLS["kdiff3"]["display_name"]},
     "winmerge": {"name": TOOLS["winmerge"]["display_name"]},
+    # Merge text files automatically, launch the fallback tool only for real conflicts
+    "native_kdiff3": {
+        "name": f'Auto + {TOOLS["kdiff3"]["display_name"]}',
+        "fallback": "kdiff3",
+        "extensions": [".cfg", ".ini"],
+    },
+    "native_winmerge": {
+        "name": f'Auto + {TOOLS["winmerge"]["display_name"]}',
+        "fallback": "winmerge",
+        "extensions": [".cfg", ".ini"],
+    },
 }
 
 DEFAULT_TOOLS_PATHS = {
@@ -90,4 +113,5 @@ DEFAULT_SETTINGS = {
     "aes_key": "0x33A604DF49A07FFD4A4C919962161F5C35A134D37EFA98DB37A34F6450D7D386",
     "merged_prefix": "~",
     "merged_static_name": "",
+    "max_repak_processes": "Auto",
 }
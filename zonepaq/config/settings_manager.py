@@ -6,7 +6,7 @@ from pathlib import Path
 
 from backend.logger import log
 from backend.utilities import Files
-from config.defaults import DEFAULT_SETTINGS, DEFAULT_TOOLS_PATHS, TOOLS
+from config.defaults import CACHE, DEFAULT_SETTINGS, DEFAULT_TOOLS_PATHS, TOOLS
 
 
 class ConfigSource(ABC):
@@ -121,9 +121,11 @@ class SettingsManager:
         self.AES_KEY = self.get("SETTINGS", "aes_key")
         self.MERGED_PREFIX = self.get("SETTINGS", "merged_prefix")
         self.MERGED_STATIC_NAME = self.get("SETTINGS", "merged_static_name")
+        self.MAX_REPAK_PROCESSES = self.get("SETTINGS", "max_repak_processes")
 
         # links
         self.TOOLS = TOOLS
+        self.CACHE = CACHE
 
         self.games_manager.update_paths(self.GAME_PATHS[self.games_manager.game_name])
 
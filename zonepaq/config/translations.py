@@ -13,10 +13,15 @@ TRANSLATIONS = {
         "settings_tools": "Tools",
         "settings_tools_path_tools": "Executables Paths",
         "settings_tools_merging_engine": "Merging Engine",
+        "settings_tools_performance": "Performance",
+        "settings_tools_max_repak_processes": "Parallel repak processes per disk",
         "settings_tools_used_tool": "Used Tool",
         "settings_tools_browse": "Browse",
         "settings_tools_install": "Install",
         "settings_tools_unpack": "Unpack",
+        "settings_tools_refresh": "Refresh",
+        "settings_tools_unpack_cancel": "These vanilla files are still being unpacked. Cancel unpacking?",
+        "settings_tools_install_cancel": "This tool is still being downloaded. Cancel the download?",
         "settings_tools_get": "Get",
         "settings_game": "Game",
         "settings_game_path": "Game Folder Path",
@@ -41,6 +46,10 @@ TRANSLATIONS = {
         "generic_cancel": "Cancel",
         "generic_retry": "Retry",
         "generic_folder_is_not_empty": "Folder isn't empty",
+        "generic_up_to_date": "Already up to date",
+        "generic_added": "Added",
+        "generic_changed": "Changed",
+        "generic_removed": "Removed",
         "generic_question": "Question",
         "generic_info": "Info",
         "generic_success": "Success",
@@ -69,6 +78,14 @@ TRANSLATIONS = {
         "generic_any_files": "Any Files",
         "pak": ".pak files",
         "folders": "folders",
+        "task_list": "Listing",
+        "task_unpack": "Unpacking",
+        "task_repack": "Repacking",
+        "task_extract": "Extracting",
+        "task_hash": "Comparing",
+        "task_merge": "Merging",
+        "task_download": "Downloading",
+        "task_eta": "left",
         "first_launch_sequence_title": "First Launch",
         "first_launch_sequence_welcome_1": "Welcome! It seems that you launched",
         "first_launch_sequence_welcome_2": "for the first time.",
@@ -124,6 +141,9 @@ TRANSLATIONS = {
         "merge_screen_conflicts_pak_sources": "PAK Sources",
         "merge_screen_conflicts_pak_sources_paths": "PAK Sources Paths",
         "merge_screen_conflicts_no_conflicts_count": "Number of files without conflicts:",
+        "merge_screen_conflicts_identical_count": "Number of conflicts between identical files:",
+        "merge_screen_conflicts_vanilla_copies_count": "Number of conflicts with unmodified vanilla copies:",
+        "merge_screen_conflicts_vanilla_copy": "vanilla copy",
         "merge_screen_conflicts_dual_match_count": "Number of dual-source conflicts with matching vanilla files:",
         "merge_screen_conflicts_dual_no_match_count": "Number of dual-source conflicts without matching vanilla files:",
         "merge_screen_conflicts_tri_count": "Number of tri-source conflicts:",
@@ -143,6 +163,9 @@ TRANSLATIONS = {
         "merge_screen_ignore_no_conflicts_checkbutton": "Ignore files without conflicts",
         "merge_screen_conflicts_action_button": "Process",
         "merge_screen_conflicts_select_all_button": "Select All",
+        "merge_screen_conflicts_cancel_button": "Cancel",
+        "merge_screen_conflicts_progress": "Processed",
+        "merge_screen_conflicts_cancelled": "Merged mod wasn't saved: processing was cancelled.",
         "merge_screen_conflicts_hints": (
             "Instructions:\n"
             '1. Select multiple conflicting files in the tree view by holding CTRL or SHIFT and clicking on them, then click the "Process" button.\n'
@@ -156,6 +179,7 @@ TRANSLATIONS = {
         ),
         "merging_error_invalid_values": "invalid values",
         "merging_error_no_conflicts": "no conflicts",
+        "merging_error_identical": "identical in all sources",
         "merging_error_too_much_sources": "too much sources",
         "merging_error_ineligible_for_merging": "ineligible for merging",
         "merging_error_missing_key": "missing key",
@@ -184,6 +208,8 @@ TRANSLATIONS = {
         "tooltip_button_repack": "Repack folders to destination",
         "tooltip_button_merge": "Analyze conflicts",
         "tooltip_button_label_no_conflicts_count": 'Files modified by 1 mod; won\'t be compared if "Ignore files without conflicts" is checked',
+        "tooltip_button_label_identical_count": 'Files modified by 2+ mods in exactly the same way; will be copied as is without comparison, or skipped if "Ignore files without conflicts" is checked',
+        "tooltip_button_label_vanilla_copies_count": "Files modified by a single mod while other mods ship unmodified vanilla copies; the modified file will be copied as is, so the copies can't override it by load order. Vanilla copies are left out of merging other conflicts too",
         "tooltip_button_label_dual_match_count": "Files modified by 2 mods; matching vanilla file is unpacked and will be used in comparison",
         "tooltip_button_label_dual_no_match_count": "Files modified by 2 mods; matching vanilla file isn't found, please unpack vanilla files in settings!",
         "tooltip_button_label_tri_count": "Files modified by 3 mods; will be compared without vanilla base",
@@ -191,6 +217,8 @@ TRANSLATIONS = {
         "tooltip_checkbox_ignore_no_conflicts": "Uncheck to include non-conflicting files to a merge mod or to compare them with matching vanilla file",
         "tooltip_button_select_all": "Select all files in the treeview",
         "tooltip_button_process": "Start merging selected files in groups",
+        "tooltip_max_repak_processes": "Upper limit of repak processes working with the same disk at once; the actual number adapts to disk speed. Use 1 or 2 for HDDs",
+        "tooltip_button_cancel_processing": "Stop processing after the current file; nothing will be saved",
     },
     "Русский": {
         "meta_description": "Удобное графическое приложение для распаковки, упаковки и разрешения конфликтов .pak модов.",
@@ -206,10 +234,15 @@ TRANSLATIONS = {
         "settings_tools": "Утилиты",
         "settings_tools_path_tools": "Пути к исполняемым файлам",
         "settings_tools_merging_engine": "Утилита сравнения",
+        "settings_tools_performance": "Производительность",
+        "settings_tools_max_repak_processes": "Параллельных процессов repak на диск",
         "settings_tools_used_tool": "Утилита",
         "settings_tools_browse": "Обзор",
         "settings_tools_install": "Установить",
         "settings_tools_unpack": "Распаковать",
+        "settings_tools_refresh": "Обновить",
+        "settings_tools_unpack_cancel": "Эти оригинальные файлы ещё распаковываются. Отменить распаковку?",
+        "settings_tools_install_cancel": "Этот инструмент ещё загружается. Отменить загрузку?",
         "settings_tools_get": "Получить",
         "settings_game": "Игра",
         "settings_game_path": "Путь к папке с игрой",
@@ -234,6 +267,10 @@ TRANSLATIONS = {
         "generic_cancel": "Отменить",
         "generic_retry": "Повторить",
         "generic_folder_is_not_empty": "Папка не пуста",
+        "generic_up_to_date": "Уже актуальны",
+        "generic_added": "Добавлено",
+        "generic_changed": "Изменено",
+        "generic_removed": "Удалено",
         "generic_question": "Вопрос",
         "generic_info": "Информация",
         "generic_success": "Успех",
@@ -262,6 +299,14 @@ TRANSLATIONS = {
         "generic_any_files": "Любые файлы",
         "pak": ".pak файлы",
         "folders": "папки",
+        "task_list": "Чтение списка",
+        "task_unpack": "Распаковка",
+        "task_repack": "Упаковка",
+        "task_extract": "Извлечение",
+        "task_hash": "Сравнение",
+        "task_merge": "Объединение",
+        "task_download": "Загрузка",
+        "task_eta": "осталось",
         "first_launch_sequence_title": "Первый запуск",
         "first_launch_sequence_welcome_1": "Приветствую! Похоже, вы запустили",
         "first_launch_sequence_welcome_2": "впервые.",
@@ -317,6 +362,9 @@ TRANSLATIONS = {
         "merge_screen_conflicts_pak_sources": "Источник PAK",
         "merge_screen_conflicts_pak_sources_paths": "Пути источников PAK",
         "merge_screen_conflicts_no_conflicts_count": "Количество файлов без конфликтов:",
+        "merge_screen_conflicts_identical_count": "Количество конфликтов между идентичными файлами:",
+        "merge_screen_conflicts_vanilla_copies_count": "Количество конфликтов с неизмененными копиями оригиналов:",
+        "merge_screen_conflicts_vanilla_copy": "копия оригинала",
         "merge_screen_conflicts_dual_match_count": "Количество конфликтов с двумя источниками и найденным оригинальным файлом:",
         "merge_screen_conflicts_dual_no_match_count": "Количество конфликтов с двумя источниками без найденного оригинального файла:",
         "merge_screen_conflicts_tri_count": "Количество конфликтов с тремя источниками:",
@@ -336,6 +384,9 @@ TRANSLATIONS = {
         "merge_screen_ignore_no_conflicts_checkbutton": "Игнорировать файлы без конфликтов",
         "merge_screen_conflicts_action_button": "Обработать",
         "merge_screen_conflicts_select_all_button": "Выбрать все",
+        "merge_screen_conflicts_cancel_button": "Отмена",
+        "merge_screen_conflicts_progress": "Обработано",
+        "merge_screen_conflicts_cancelled": "Объединенный мод не был сохранен: обработка отменена.",
         "merge_screen_conflicts_hints": (
             "Инструкция:\n"
             '1. Выберите несколько конфликтующих файлов в дереве, удерживая CTRL или SHIFT и нажимая на них, затем нажмите кнопку "Обработать".\n'
@@ -349,6 +400,7 @@ TRANSLATIONS = {
         ),
         "merging_error_invalid_values": "некорректные значения",
         "merging_error_no_conflicts": "нет конфликтов",
+        "merging_error_identical": "идентичен во всех источниках",
         "merging_error_too_much_sources": "слишком много источников",
         "merging_error_ineligible_for_merging": "не подходит для слияния",
         "merging_error_missing_key": "отсутствует ключ",
@@ -377,6 +429,8 @@ TRANSLATIONS = {
         "tooltip_button_repack": "Запаковать папки в папку назначения",
         "tooltip_button_merge": "Анализировать конфликты",
         "tooltip_button_label_no_conflicts_count": 'Файлы, измененные одним модом; не будут сравниваться, если включена опция "Игнорировать файлы без конфликтов"',
+        "tooltip_button_label_identical_count": 'Файлы, одинаково измененные двумя и более модами; будут скопированы без сравнения или пропущены, если включена опция "Игнорировать файлы без конфликтов"',
+        "tooltip_button_label_vanilla_copies_count": "Файлы, измененные одним модом, когда другие моды содержат неизмененные копии оригиналов; измененный файл будет скопирован как есть, чтобы копии не перекрыли его порядком загрузки. При слиянии других конфликтов копии оригиналов тоже не учитываются",
         "tooltip_button_label_dual_match_count": "Файлы, измененные двумя модами; совпадающий файл из оригинальной версии будет распакован и использован для сравнения",
         "tooltip_button_label_dual_no_match_count": "Файлы, измененные двумя модами; совпадающий файл из оригинальной версии не найден, пожалуйста, распакуйте оригинальные файлы в настройках!",
         "tooltip_button_label_tri_count": "Файлы, измененные тремя модами; будут сравниваться без оригинальной базы",
@@ -384,6 +438,8 @@ TRANSLATIONS = {
         "tooltip_checkbox_ignore_no_conflicts": "Снимите галочку, чтобы включить файлы без конфликтов в объединение модов или сравнить их с совпадающим файлом из оригинальной версии",
         "tooltip_button_select_all": "Выбрать все файлы в представлении дерева",
         "tooltip_button_process": "Начать объединение выбранных файлов по группам",
+        "tooltip_max_repak_processes": "Наибольшее число процессов repak, одновременно работающих с одним диском; фактическое число подстраивается под скорость диска. Для HDD используйте 1 или 2",
+        "tooltip_button_cancel_processing": "Остановить обработку после текущего файла; ничего не будет сохранено",
     },
 }
 
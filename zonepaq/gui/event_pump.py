@@ -0,0 +1,52 @@
+import threading
+from tkinter import TclError
+
+from backend.event_bus import EventBus
+from backend.logger import log
+
+
+class TkEventPump:
+    """
+    Delivers task events to a Tk widget on the main thread.
+    Events published in between are queued and handed over in batches every `interval` ms.
+    """
+
+    def __init__(self, widget, callback, interval=100):
+        self.widget = widget
+        self.callback = callback
+        self.interval = interval
+        self.events = []
+        self.events_lock = threading.Lock()
+        self.after_id = None
+        self.token = EventBus().subscribe(self._enqueue)
+        self._schedule()
+
+    def _enqueue(self, event):
+        with self.events_lock:
+            self.events.append(event)
+
+    def _schedule(self):
+        try:
+            self.after_id = self.widget.after(self.interval, self._pump)
+        except (RuntimeError, TclError):
+            # The widget is already destroyed
+            self.stop()
+
+    def _pump(self):
+        with self.events_lock:
+            events, self.events = self.events, []
+        if events:
+            try:
+                self.callback(events)
+            except Exception as e:
+                log.exception(f"Failed to deliver task events: {e}")
+        self._schedule()
+
+    def stop(self):
+        EventBus().unsubscribe(self.token)
+        if self.after_id is not None:
+            try:
+                self.widget.after_cancel(self.after_id)
+            except (RuntimeError, TclError):
+                pass
+            self.after_id = None
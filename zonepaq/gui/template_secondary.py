@@ -3,9 +3,11 @@ from pathlib import Path
 
 import customtkinter as ctk
 from backend.logger import log
+from backend.parallel_orchestrator import CancellationToken
 from config.settings_manager import settings
 from config.translations import translate
 from CTkListbox import CTkListbox
+from gui.event_pump import TkEventPump
 from gui.template_toplevel import TemplateToplevel
 from gui.window_messagebox import ModalFileDialog, WindowMessageBox
 from tkinterdnd2 import DND_FILES
@@ -18,6 +20,10 @@ class TemplateSecondary(TemplateToplevel):
 
         self.grid_columnconfigure(0, weight=1)
 
+        # Cancelled when the window is closed, so its background tasks stop as well
+        self.cancel_token = CancellationToken()
+        self.task_event_pump = None
+
     @property
     def repak_cli(self):
         return settings.TOOLS_PATHS["repak_cli"]
@@ -70,6 +76,71 @@ class TemplateSecondary(TemplateToplevel):
         )
         self.add_tooltip(action_button, tooltip_action_button)
 
+    def stop_background_tasks(self):
+        self.cancel_token.cancel()
+        if self.task_event_pump is not None:
+            self.task_event_pump.stop()
+
+    def create_task_progress(self):
+        """Show progress of background tasks below the sections, hidden while idle."""
+        self.active_tasks = {}
+
+        progress_frame = self.create_frame(
+            self,
+            padx=self.padding,
+            pady=(0, self.padding),
+            column_weights=[(0, 1)],
+            sticky="ew",
+        )
+        self.task_progress_label = self.create_ctk_widget(
+            ctk_widget=ctk.CTkLabel,
+            widget_args={
+                "master": progress_frame,
+                "text": "",
+                "anchor": "w",
+            },
+            widget_style="Normal.CTkLabel",
+            grid_args={"row": 0, "column": 0, "sticky": "ew"},
+        )
+        self.task_progress_bar = self.create_ctk_widget(
+            ctk_widget=ctk.CTkProgressBar,
+            widget_args={"master": progress_frame},
+            grid_args={"row": 1, "column": 0, "sticky": "ew"},
+        )
+        self.task_progress_frame = progress_frame
+        progress_frame.grid_remove()
+
+        self.task_event_pump = TkEventPump(self, self._on_task_events)
+
+    def _on_task_events(self, events):
+        for event in events:
+            if event.is_over:
+                self.active_tasks.pop(event.task_id, None)
+            else:
+                self.active_tasks[event.task_id] = event
+
+        if not self.active_tasks:
+            self.task_progress_frame.grid_remove()
+            return
+
+        # Batches of items are more telling than the single item being processed
+        event = max(
+            self.active_tasks.values(),
+            key=lambda event: (event.total is not None, event.started_at),
+        )
+        text = translate(f"task_{event.name}")
+        if event.subject:
+            text += f" {event.subject}"
+        if event.total:
+            text += f": {event.done}/{event.total}"
+        if event.eta is not None:
+            minutes, seconds = divmod(int(event.eta), 60)
+            text += f" ({minutes}:{seconds:02d} {translate('task_eta')})"
+
+        self.task_progress_label.configure(text=text)
+        self.task_progress_bar.set(event.fraction or 0)
+        self.task_progress_frame.grid()
+
     def _create_listbox(self, root, listbox_name, listbox_mode):
         listbox = self.create_ctk_widget(
             ctk_widget=CTkListbox,
@@ -1,10 +1,12 @@
 from collections import deque
 from pathlib import Path
-from tkinter import ttk
+from tkinter import TclError, ttk
 
 import customtkinter as ctk
-from backend.conflicts import ConflictProcessor
+from backend.conflicts import ConflictAnalyzer, ConflictProcessor
 from backend.logger import log
+from backend.parallel_orchestrator import CancellationToken, ThreadManager
+from backend.vanilla_index import VanillaIndex
 from config.settings_manager import settings
 from config.translations import translate
 from gui.template_toplevel import TemplateToplevel
@@ -14,7 +16,9 @@ from gui.window_messagebox import WindowMessageBox
 class WindowConflicts(TemplateToplevel):
     """Displays conflict reports and provides tools to analyze and merge files."""
 
-    def __init__(self, master, content_tree):
+    def __init__(
+        self, master, content_tree, identical_entries=None, vanilla_copies=None
+    ):
         super().__init__(
             master=master,
             title=translate("merge_screen_conflicts_title"),
@@ -22,10 +26,17 @@ class WindowConflicts(TemplateToplevel):
 
         self.content_tree = content_tree
         self.original_data = content_tree
+        self.identical_entries = identical_entries or set()
+        # Paks shipping unmodified vanilla files, by entry path, marked in the tree
+        self.vanilla_copies = vanilla_copies or {}
+        self.vanilla_index = VanillaIndex()
 
         # Variable for checkbutton state
         self.show_full_paths = ctk.BooleanVar(value=False)
 
+        # Set while selected files are processed in the background
+        self.cancel_token = None
+
         self.setup()
 
         self.adjust_to_content(self, adjust_width=True, adjust_height=True)
@@ -33,6 +44,8 @@ class WindowConflicts(TemplateToplevel):
         log.info("Conflicts resolver window opened.")
 
     def on_closing(self):
+        if self.cancel_token is not None:
+            self.cancel_token.cancel()
         log.info("Conflicts resolver window closed.")
         self.destroy()
         # self.master.deiconify()
@@ -170,6 +183,18 @@ class WindowConflicts(TemplateToplevel):
                 "color_success", settings.THEME_NAME
             ),
         )
+        self.tree.tag_configure(
+            "identical",
+            foreground=self.theme_manager.get_color_for_mode(
+                "color_highlight", settings.THEME_NAME
+            ),
+        )
+        self.tree.tag_configure(
+            "vanilla_copy",
+            foreground=self.theme_manager.get_color_for_mode(
+                "color_highlight", settings.THEME_NAME
+            ),
+        )
         self.tree.tag_configure(
             "dual_match",
             foreground=self.theme_manager.get_color_for_mode(
@@ -281,11 +306,21 @@ class WindowConflicts(TemplateToplevel):
             translate("tooltip_button_label_no_conflicts_count"),
         )
 
+        label_identical_count = self._create_legend_label(
+            legend_frame,
+            text=f"{translate('merge_screen_conflicts_identical_count')} {self.conflict_counts['identical_count']}",
+            style="Highlight.CTkLabel",
+            row=2,
+        )
+        self.add_tooltip(
+            label_identical_count, translate("tooltip_button_label_identical_count")
+        )
+
         label_dual_match_count = self._create_legend_label(
             legend_frame,
             text=f"{translate('merge_screen_conflicts_dual_match_count')} {self.conflict_counts['dual_match_count']}",
             style="Normal.CTkLabel",
-            row=2,
+            row=3,
         )
         self.add_tooltip(
             label_dual_match_count, translate("tooltip_button_label_dual_match_count")
@@ -295,7 +330,7 @@ class WindowConflicts(TemplateToplevel):
             legend_frame,
             text=f"{translate('merge_screen_conflicts_dual_no_match_count')} {self.conflict_counts['dual_no_match_count']}",
             style="Attention.CTkLabel",
-            row=3,
+            row=4,
         )
         self.add_tooltip(
             label_dual_no_match_count,
@@ -306,7 +341,7 @@ class WindowConflicts(TemplateToplevel):
             legend_frame,
             text=f"{translate('merge_screen_conflicts_tri_count')} {self.conflict_counts['tri_count']}",
             style="Warning.CTkLabel",
-            row=4,
+            row=5,
         )
         self.add_tooltip(label_tri_count, translate("tooltip_button_label_tri_count"))
 
@@ -314,12 +349,23 @@ class WindowConflicts(TemplateToplevel):
             legend_frame,
             text=f"{translate('merge_screen_conflicts_complex_count')} {self.conflict_counts['complex_count']}",
             style="Error.CTkLabel",
-            row=5,
+            row=6,
         )
         self.add_tooltip(
             label_complex_count, translate("tooltip_button_label_complex_count")
         )
 
+        label_vanilla_copies_count = self._create_legend_label(
+            legend_frame,
+            text=f"{translate('merge_screen_conflicts_vanilla_copies_count')} {self.conflict_counts['vanilla_copy_count']}",
+            style="Highlight.CTkLabel",
+            row=7,
+        )
+        self.add_tooltip(
+            label_vanilla_copies_count,
+            translate("tooltip_button_label_vanilla_copies_count"),
+        )
+
     def _create_legend_label(self, legend_frame, text, style, row):
         return self.create_ctk_widget(
             ctk_widget=ctk.CTkLabel,
@@ -342,7 +388,7 @@ class WindowConflicts(TemplateToplevel):
             legend_frame,
             row=1,
             column=1,
-            rowspan=4,
+            rowspan=5,
             padx=(self.padding * 2, 0),
             sticky="ne",
         )
@@ -393,7 +439,7 @@ class WindowConflicts(TemplateToplevel):
             translate("tooltip_button_select_all"),
         )
 
-        button_process = self.create_button(
+        self.button_process = self.create_button(
             buttons_frame,
             text=translate("merge_screen_conflicts_action_button"),
             command=lambda: self._process_selected_files(),
@@ -405,10 +451,56 @@ class WindowConflicts(TemplateToplevel):
             sticky="ne",
         )
         self.add_tooltip(
-            button_process,
+            self.button_process,
             translate("tooltip_button_process"),
         )
 
+        self.button_cancel = self.create_button(
+            buttons_frame,
+            text=translate("merge_screen_conflicts_cancel_button"),
+            command=lambda: self._cancel_processing(),
+            width=150,
+            height=40,
+            row=0,
+            column=1,
+            sticky="ne",
+        )
+        self.add_tooltip(
+            self.button_cancel,
+            translate("tooltip_button_cancel_processing"),
+        )
+        self.button_cancel.grid_remove()
+
+        self.progress_label = self.create_ctk_widget(
+            ctk_widget=ctk.CTkLabel,
+            widget_args={
+                "master": process_frame,
+                "text": "",
+                "justify": "right",
+                "anchor": "e",
+            },
+            widget_style="Normal.CTkLabel",
+            grid_args={
+                "row": 2,
+                "column": 0,
+                "pady": (self.padding / 2, 0),
+                "sticky": "ew",
+            },
+        )
+        self.progress_bar = self.create_ctk_widget(
+            ctk_widget=ctk.CTkProgressBar,
+            widget_args={
+                "master": process_frame,
+            },
+            grid_args={
+                "row": 3,
+                "column": 0,
+                "sticky": "ew",
+            },
+        )
+        self.progress_label.grid_remove()
+        self.progress_bar.grid_remove()
+
     def _select_tagged_items(self):
         self.tree.selection_remove(self.tree.selection())
         nodes_to_visit = deque(self.tree.get_children(""))
@@ -459,8 +551,101 @@ class WindowConflicts(TemplateToplevel):
         )
 
     def _process_selected_files(self):
-        processor = ConflictProcessor(self, self.ignore_no_conflicts)
-        messagebox_type, messagebox_message = processor.process_selected_files()
+        if self.cancel_token is not None:
+            return
+
+        processor = ConflictProcessor(
+            self, self.ignore_no_conflicts, self.vanilla_copies
+        )
+        report = processor.collect_selected_items()
+        if report:
+            self._show_report(*report)
+            return
+
+        self.cancel_token = CancellationToken()
+        self._set_processing_state(True)
+
+        def report_progress(done, total, item_name):
+            self._run_on_main_thread(self._update_progress, done, total, item_name)
+
+        def task_runner(cancel_token):
+            try:
+                report = processor.merge_items(report_progress, cancel_token)
+            except Exception as e:
+                log.exception(f"Unexpected error during merging: {e}")
+                processor.cleanup()
+                report = ("error", translate("merging_error_processing_error"))
+            self._run_on_main_thread(self._on_items_merged, processor, report)
+
+        ThreadManager.run_in_background(lambda: task_runner(self.cancel_token))
+
+    def _on_items_merged(self, processor, report):
+        if report:
+            self._finish_processing(report)
+            return
+
+        folder_to_place_merged_mod = processor.ask_merged_mod_location()
+        if not folder_to_place_merged_mod:
+            processor.cleanup()
+            self._finish_processing(
+                ("warning", translate("merge_screen_conflicts_aborted"))
+            )
+            return
+
+        self.progress_bar.configure(mode="indeterminate")
+        self.progress_bar.start()
+
+        def task_runner(cancel_token):
+            report = processor.repack_merged_mod(
+                folder_to_place_merged_mod, cancel_token
+            )
+            self._run_on_main_thread(self._finish_processing, report)
+
+        ThreadManager.run_in_background(lambda: task_runner(self.cancel_token))
+
+    def _finish_processing(self, report):
+        self.cancel_token = None
+        self._set_processing_state(False)
+        self._show_report(*report)
+
+    def _cancel_processing(self):
+        if self.cancel_token is not None:
+            log.info("Cancelling merging...")
+            self.cancel_token.cancel()
+            self.button_cancel.configure(state="disabled")
+
+    def _run_on_main_thread(self, func, *args):
+        try:
+            self.after(0, lambda: func(*args))
+        except (RuntimeError, TclError):
+            # The window is already destroyed
+            log.debug(f"Can't schedule {func.__name__}, window is closed.")
+
+    def _set_processing_state(self, processing):
+        if processing:
+            self.button_process.grid_remove()
+            self.button_cancel.configure(state="normal")
+            self.button_cancel.grid()
+            self.progress_bar.configure(mode="determinate")
+            self.progress_bar.set(0)
+            self.progress_label.configure(text="")
+            self.progress_label.grid()
+            self.progress_bar.grid()
+        else:
+            self.progress_bar.stop()
+            self.progress_label.grid_remove()
+            self.progress_bar.grid_remove()
+            self.button_cancel.grid_remove()
+            self.button_process.grid()
+
+    def _update_progress(self, done, total, item_name):
+        self.progress_bar.set(done / total if total else 1)
+        text = f"{translate('merge_screen_conflicts_progress')} {done}/{total}"
+        if item_name:
+            text += f": {item_name}"
+        self.progress_label.configure(text=text)
+
+    def _show_report(self, messagebox_type, messagebox_message):
         messagebox_functions = {
             "info": WindowMessageBox.showinfo,
             "warning": WindowMessageBox.showwarning,
@@ -474,9 +659,14 @@ class WindowConflicts(TemplateToplevel):
             )
 
     def _populate_tree(self, parent_node, data):
+        self.vanilla_index.refresh(
+            item["unpacked"] for item in self.games_manager.vanilla_files
+        )
         queue = deque([(parent_node, data, [])])
 
         no_conflicts_count = 0
+        identical_count = 0
+        vanilla_copy_count = 0
         dual_match_count = 0
         dual_no_match_count = 0
         tri_count = 0
@@ -494,13 +684,27 @@ class WindowConflicts(TemplateToplevel):
                 full_path = str(Path(*parent_path) / key)
 
                 if isinstance(value, list):
-                    num_sources = len(value)
+                    modified, copies = ConflictAnalyzer.split_vanilla_copies(
+                        self.vanilla_copies, Path(full_path).as_posix(), value
+                    )
+                    # Vanilla copies only count when nothing else modifies the file
+                    num_sources = len(modified) if modified else len(value)
                     has_match = self._has_vanilla_match(full_path)
+                    is_identical = (
+                        Path(full_path).as_posix() in self.identical_entries
+                        or not modified
+                    )
 
-                    tag = self._determine_tag(num_sources, has_match)
+                    tag = self._determine_tag(num_sources, has_match, is_identical)
+                    if tag == "no_conflicts" and copies:
+                        tag = "vanilla_copy"
                     if tag:
                         if tag == "no_conflicts":
                             no_conflicts_count += 1
+                        elif tag == "identical":
+                            identical_count += 1
+                        elif tag == "vanilla_copy":
+                            vanilla_copy_count += 1
                         elif tag == "dual_match":
                             dual_match_count += 1
                         elif tag == "dual_no_match":
@@ -511,7 +715,7 @@ class WindowConflicts(TemplateToplevel):
                             complex_count += 1
 
                     self._insert_node_into_tree(
-                        current_parent_node, key, value, full_path, tag
+                        current_parent_node, key, value, full_path, tag, copies
                     )
 
                 elif isinstance(value, dict):
@@ -532,17 +736,28 @@ class WindowConflicts(TemplateToplevel):
 
         return {
             "no_conflicts_count": no_conflicts_count,
+            "identical_count": identical_count,
+            "vanilla_copy_count": vanilla_copy_count,
             "dual_match_count": dual_match_count,
             "dual_no_match_count": dual_no_match_count,
             "tri_count": tri_count,
             "complex_count": complex_count,
         }
 
-    def _insert_node_into_tree(self, parent_node, key, value, full_path, tag):
+    def _insert_node_into_tree(
+        self, parent_node, key, value, full_path, tag, vanilla_copies=()
+    ):
         sorted_value = sorted(value, key=lambda src: Path(src).name)
 
         source_paths = [str(Path(src)) for src in sorted_value]
-        source_filenames = [str(Path(src).name) for src in sorted_value]
+        source_filenames = [
+            (
+                f'{Path(src).name} ({translate("merge_screen_conflicts_vanilla_copy")})'
+                if src in vanilla_copies
+                else str(Path(src).name)
+            )
+            for src in sorted_value
+        ]
 
         self.tree.insert(
             parent_node,
@@ -552,9 +767,11 @@ class WindowConflicts(TemplateToplevel):
             tags=[tag] if tag else [],
         )
 
-    def _determine_tag(self, num_sources, has_match):
+    def _determine_tag(self, num_sources, has_match, is_identical=False):
         if num_sources == 1:
             return "no_conflicts"
+        if is_identical:
+            return "identical"
         if num_sources == 2:
             return "dual_match" if has_match else "dual_no_match"
         elif num_sources == 3:
@@ -598,9 +815,4 @@ class WindowConflicts(TemplateToplevel):
             self.tree.column("PAK Sources Paths", width=0, stretch=ctk.NO)
 
     def _has_vanilla_match(self, conflict):
-        for vanilla_file in self.games_manager.vanilla_files:
-            unpacked = vanilla_file["unpacked"]
-            vanilla_path = Path(unpacked) / conflict
-            if vanilla_path.exists() and vanilla_path.is_file():
-                return True
-        return False
+        return self.vanilla_index.contains(conflict)
@@ -3,7 +3,7 @@ from pathlib import Path
 
 import customtkinter as ctk
 from backend.logger import log
-from backend.parallel_orchestrator import ThreadExecutor, ThreadManager
+from backend.parallel_orchestrator import ExecutorRegistry, ThreadManager
 from backend.utilities import Data, Files
 from config.defaults import TOOLS
 from config.metadata import APP_NAME
@@ -40,7 +40,7 @@ class WindowFirstLaunch(TemplateBase):
         super().__init__(title=translate("first_launch_sequence_title"))
 
         self.style_manager = StyleManager
-        self.executor = ThreadExecutor()
+        self.executor = ExecutorRegistry().get("io")
 
         self.text_installed = [
             translate("generic_installed"),
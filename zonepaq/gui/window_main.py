@@ -1,4 +1,5 @@
 from backend.logger import log
+from backend.parallel_orchestrator import ExecutorRegistry
 from config.translations import translate
 from gui.template_base import TemplateBase
 
@@ -17,8 +18,24 @@ class WindowMain(TemplateBase):
 
     def on_closing(self):
         log.info("Main window closed.")
+        self._stop_background_tasks()
         self.destroy()
 
+    def _stop_background_tasks(self):
+        """
+        Cancel work of the windows still open and drop queued jobs, so closing doesn't wait for them.
+        Executors have to be shut down here, their workers are joined before atexit handlers run.
+        """
+        windows = list(self.winfo_children())
+        while windows:
+            window = windows.pop()
+            cancel_token = getattr(window, "cancel_token", None)
+            if cancel_token is not None:
+                cancel_token.cancel()
+            windows.extend(window.winfo_children())
+        self.tools_manager.cancel_background_tasks()
+        ExecutorRegistry().shutdown(cancel_futures=True)
+
     def _open_repak_gui(self):
         from gui.window_repak import WindowRepak
 
@@ -1,9 +1,11 @@
 from pathlib import Path
 
+from backend.conflicts import ConflictAnalyzer
 from backend.logger import log
+from backend.pak_index_cache import PakIndexCache
 from backend.parallel_orchestrator import (
+    ExecutorRegistry,
     TaskRetryManager,
-    ThreadExecutor,
     ThreadManager,
 )
 from backend.repak import Repak
@@ -20,6 +22,7 @@ class WindowMerge(TemplateSecondary):
     def __init__(self, master):
         super().__init__(master, title=translate("merge_screen_title"))
         self._create_sections()
+        self.create_task_progress()
         self.create_settings_button(self)
 
         self.adjust_to_content(self, adjust_width=True, adjust_height=True)
@@ -28,6 +31,7 @@ class WindowMerge(TemplateSecondary):
 
     def on_closing(self):
         log.info("Merge window closed.")
+        self.stop_background_tasks()
         self.destroy()
         self.master.deiconify()
 
@@ -57,12 +61,25 @@ class WindowMerge(TemplateSecondary):
 
     def _find_conflicts(self):
         def task_runner(files):
-            task_retry_manager = TaskRetryManager(ThreadExecutor())
+            task_retry_manager = TaskRetryManager(ExecutorRegistry().get("io"))
+            content_tree = {}
+
+            def add_to_content_tree(file, success, entries):
+                # The tree grows while the remaining paks are still being listed
+                if success:
+                    Data.add_to_content_tree(content_tree, file, entries)
 
             # Execute the tasks
             results_ok, results_ko = task_retry_manager.execute_tasks_with_retries(
-                files, Repak.get_list
+                files,
+                Repak.get_entries,
+                on_result=add_to_content_tree,
+                task_name="list",
+                cancel_token=self.cancel_token,
             )
+            PakIndexCache().save()
+            if self.cancel_token.is_cancelled:
+                return
 
             # Handle errors and results on the main thread
             if results_ko:
@@ -83,10 +100,20 @@ class WindowMerge(TemplateSecondary):
                 )
 
             if results_ok:
-                content_tree = Data.build_content_tree(results_ok)
+                # Unmodified copies of vanilla files stay in conflicts, but aren't merged
+                vanilla_copies = ConflictAnalyzer.find_vanilla_copies(results_ok)
+                identical_entries = ConflictAnalyzer.find_identical_entries(
+                    ConflictAnalyzer.without_entries(results_ok, vanilla_copies)
+                )
                 log.debug("Opening conflicts resolver screen...")
                 self.after(
-                    0, lambda: WindowConflicts(master=self, content_tree=content_tree)
+                    0,
+                    lambda: WindowConflicts(
+                        master=self,
+                        content_tree=content_tree,
+                        identical_entries=identical_entries,
+                        vanilla_copies=vanilla_copies,
+                    ),
                 )
 
         # Validate repak_cli path on the main thread
@@ -2,8 +2,8 @@ from pathlib import Path
 
 from backend.logger import log
 from backend.parallel_orchestrator import (
+    ExecutorRegistry,
     TaskRetryManager,
-    ThreadExecutor,
     ThreadManager,
 )
 from backend.repak import Repak
@@ -20,6 +20,7 @@ class WindowRepak(TemplateSecondary):
     def __init__(self, master):
         super().__init__(master, title=translate("repak_screen_title"))
         self._create_sections()
+        self.create_task_progress()
         self.create_settings_button(self)
 
         self.adjust_to_content(self, adjust_width=True, adjust_height=True)
@@ -28,6 +29,7 @@ class WindowRepak(TemplateSecondary):
 
     def on_closing(self):
         log.info("Repak window closed.")
+        self.stop_background_tasks()
         self.destroy()
         self.master.deiconify()
 
@@ -75,10 +77,15 @@ class WindowRepak(TemplateSecondary):
 
     def unpack_files(self):
         def task_runner(files, folder, overwrite):
-            task_retry_manager = TaskRetryManager(ThreadExecutor())
+            task_retry_manager = TaskRetryManager(ExecutorRegistry().get("subprocess"))
             results_ok, results_ko = task_retry_manager.execute_tasks_with_retries(
-                files, lambda f: Repak.unpack(f, folder)
+                files,
+                lambda f: Repak.unpack(f, folder, cancel_token=self.cancel_token),
+                task_name="unpack",
+                cancel_token=self.cancel_token,
             )
+            if self.cancel_token.is_cancelled:
+                return
 
             # Show results on the main thread
             self.after(
@@ -151,10 +158,17 @@ class WindowRepak(TemplateSecondary):
 
     def _repack_folders(self):
         def task_runner(folders, target_folder):
-            task_retry_manager = TaskRetryManager(ThreadExecutor())
+            task_retry_manager = TaskRetryManager(ExecutorRegistry().get("subprocess"))
             results_ok, results_ko = task_retry_manager.execute_tasks_with_retries(
-                folders, lambda f: Repak.repack(Path(f), target_folder)
+                folders,
+                lambda f: Repak.repack(
+                    Path(f), target_folder, cancel_token=self.cancel_token
+                ),
+                task_name="repack",
+                cancel_token=self.cancel_token,
             )
+            if self.cancel_token.is_cancelled:
+                return
 
             # Show results on the main thread
             self.after(
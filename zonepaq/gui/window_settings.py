@@ -287,7 +287,10 @@ class WindowSettings(TemplateToplevel):
                             "style": "Generic.CTkButton",
                         },
                         {
-                            "command": self.tools_manager.install_repak_cli,
+                            "command": lambda **kwargs: self.tools_manager.install_tool_in_background(
+                                install_method=self.tools_manager.install_repak_cli,
+                                **kwargs,
+                            ),
                             "text": translate("settings_tools_install"),
                             "style": "Alt.CTkButton",
                         },
@@ -304,7 +307,10 @@ class WindowSettings(TemplateToplevel):
                             "style": "Generic.CTkButton",
                         },
                         {
-                            "command": self.tools_manager.install_kdiff3,
+                            "command": lambda **kwargs: self.tools_manager.install_tool_in_background(
+                                install_method=self.tools_manager.install_kdiff3,
+                                **kwargs,
+                            ),
                             "text": translate("settings_tools_install"),
                             "style": "Alt.CTkButton",
                         },
@@ -321,7 +327,10 @@ class WindowSettings(TemplateToplevel):
                             "style": "Generic.CTkButton",
                         },
                         {
-                            "command": self.tools_manager.install_winmerge,
+                            "command": lambda **kwargs: self.tools_manager.install_tool_in_background(
+                                install_method=self.tools_manager.install_winmerge,
+                                **kwargs,
+                            ),
                             "text": translate("settings_tools_install"),
                             "style": "Alt.CTkButton",
                         },
@@ -383,6 +392,54 @@ class WindowSettings(TemplateToplevel):
             },
         )
 
+        self.create_subheader(group_frame, text=translate("settings_tools_performance"))
+        self.create_spacer(group_frame)
+
+        current_row = self._get_next_row(group_frame)
+
+        self.create_ctk_widget(
+            ctk_widget=ctk.CTkLabel,
+            widget_args={
+                "master": group_frame,
+                "text": f"{translate('settings_tools_max_repak_processes')}:",
+                "anchor": "w",
+                "pady": self.padding / 4,
+            },
+            grid_args={
+                "row": current_row,
+                "column": 0,
+                "sticky": "w",
+                "padx": self.padding,
+            },
+        )
+
+        self.max_repak_processes = ctk.StringVar(
+            master=self, value=settings.MAX_REPAK_PROCESSES
+        )
+        max_repak_processes_menu = self.create_ctk_widget(
+            ctk_widget=ctk.CTkOptionMenu,
+            widget_args={
+                "master": group_frame,
+                "variable": self.max_repak_processes,
+                "values": ["Auto", "1", "2", "3", "4", "6", "8"],
+                "command": lambda value=self.max_repak_processes: (
+                    settings.update_config("SETTINGS", "max_repak_processes", value),
+                ),
+                "anchor": "w",
+            },
+            grid_args={
+                "row": current_row,
+                "column": 1,
+                "sticky": "w",
+                "padx": (0, self.padding),
+                "pady": self.padding / 4,
+            },
+        )
+        self.add_tooltip(
+            max_repak_processes_menu,
+            translate("tooltip_max_repak_processes"),
+        )
+
         self.create_spacer(group_frame)
 
     def _create_entry_group(self, master, group_name, entries):
@@ -633,9 +690,12 @@ class WindowSettings(TemplateToplevel):
 
         self._apply_label_style(status, status_label)
 
+        # Unpacked folders are refreshed after game patches instead of unpacked anew
         self.create_button(
             group_frame,
-            text=translate("settings_tools_unpack"),
+            text=translate(
+                "settings_tools_refresh" if status else "settings_tools_unpack"
+            ),
             command=lambda: self.tools_manager.unpack_vanilla_files_in_background(
                 self,
                 install_metadata={